@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Optional
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+def pcm_bytes(ms: float, sample_rate: int) -> int:
+    """Bytes of mono 16-bit PCM covering ms milliseconds."""
+    return int(sample_rate * ms / 1000) * SAMPLE_WIDTH
+
+
+class PCMRingBuffer:
+    """
+    Fixed-size ring buffer of PCM bytes for one call.
+
+    Memory is allocated once up front, so a slow upstream can never grow the
+    buffer. Writes copy in through a memoryview and each read copies its
+    packet out exactly once. When full, the oldest audio is overwritten
+    (drop_oldest=True, the default for live audio) or writers wait for space.
+    """
+
+    def __init__(self, capacity: int, drop_oldest: bool = True):
+        # Keep whole samples so a drop never splits one in half
+        self.capacity = capacity - capacity % SAMPLE_WIDTH
+        self.drop_oldest = drop_oldest
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.written = 0
+        self.dropped = 0
+        self.peak = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    async def write(self, data: bytes):
+        if self._closed:
+            return
+        if not self.drop_oldest:
+            while self.capacity - self._size < min(len(data), self.capacity):
+                self._writable.clear()
+                await self._writable.wait()
+                if self._closed:
+                    return
+        self.write_nowait(data)
+
+    def write_nowait(self, data: bytes):
+        data = memoryview(data)
+        if len(data) > self.capacity:
+            self.dropped += len(data) - self.capacity
+            data = data[-self.capacity :]
+
+        overflow = self._size + len(data) - self.capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+            self.dropped += overflow
+
+        end = (self._start + self._size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._view[end : end + first] = data[:first]
+        self._view[: len(data) - first] = data[first:]
+        self._size += len(data)
+        self.written += len(data)
+        self.peak = max(self.peak, self._size)
+        self._readable.set()
+
+    def read(self, max_bytes: int) -> bytes:
+        """
+        Remove and return up to max_bytes. The slots are reused by the next
+        write, so the packet is copied out once; joining the two views
+        avoids an intermediate buffer when the data wraps around.
+        """
+        n = min(max_bytes - max_bytes % SAMPLE_WIDTH, self._size)
+        first = min(n, self.capacity - self._start)
+        out = b"".join(
+            (self._view[self._start : self._start + first], self._view[: n - first])
+        )
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        if not self._size:
+            self._readable.clear()
+        self._writable.set()
+        return out
+
+    async def read_packet(
+        self, min_bytes: int, max_bytes: int, max_wait: float
+    ) -> Optional[bytes]:
+        """
+        Wait for at least min_bytes, or whatever arrived within max_wait of
+        the first byte, and return up to max_bytes. Returns None once closed
+        and drained.
+        """
+        while not self._size:
+            if self._closed:
+                return None
+            await self._readable.wait()
+
+        deadline = time.monotonic() + max_wait
+        while self._size < min_bytes and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._readable.clear()
+            try:
+                await asyncio.wait_for(self._readable.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.read(max_bytes)
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self._readable.clear()
+        self._writable.set()
+
+    def close(self):
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+    def stats(self) -> dict:
+        return {
+            "capacity_bytes": self.capacity,
+            "buffered_bytes": self._size,
+            "peak_bytes": self.peak,
+            "written_bytes": self.written,
+            "dropped_bytes": self.dropped,
+        }
+
+
+class PacketCoalescer:
+    """
+    Joins small output chunks into packets of at least min_bytes before they
+    are forwarded, flushing whatever is left at the end of a turn.
+    """
+
+    def __init__(self, min_bytes: int):
+        self.min_bytes = min_bytes
+        self._pending = bytearray()
+
+    def add(self, data: bytes) -> Optional[bytes]:
+        self._pending += data
+        if len(self._pending) < self.min_bytes:
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[bytes]:
+        if not self._pending:
+            return None
+        packet = bytes(self._pending)
+        self._pending.clear()
+        return packet
+
+    def clear(self):
+        self._pending.clear()
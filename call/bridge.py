@@ -1,6 +1,9 @@
 import os
 import asyncio
-from typing import Callable, Awaitable
+import time
+import uuid
+from collections import Counter, deque
+from typing import Callable, Awaitable, Optional
 
 from google import genai
 from google.genai.types import (
@@ -12,6 +15,10 @@ from google.genai.types import (
 )
 from google.genai.live import AsyncSession
 
+from call.audio_buffer import PCMRingBuffer, PacketCoalescer, pcm_bytes
+from call.codec import SpeechDetector, TwilioCodec, pcm_rms
+from call.latency import latency, now
+
 MODEL = "models/gemini-2.0-flash-live-001"
 CONFIG = LiveConnectConfig(
     response_modalities=[Modality.TEXT, Modality.AUDIO],
@@ -19,48 +26,228 @@ CONFIG = LiveConnectConfig(
     # output_audio_transcription=AudioTranscriptionConfig(),
 )
 
+INPUT_SAMPLE_RATE = 16000
+OUTPUT_SAMPLE_RATE = 24000
+# Inbound audio is sent in 20-40 ms packets; at most this much is held per call
+PACKET_MIN_MS = 20
+PACKET_MAX_MS = 40
+BUFFER_MS = 2000
+# Packets louder than this count as speech when timing a turn
+VOICE_RMS_THRESHOLD = float(os.getenv("VOICE_RMS_THRESHOLD", "500"))
+# Speech this long while the model is talking counts as a barge-in
+BARGE_IN_MS = float(os.getenv("BARGE_IN_MS", "120"))
+
 
 class GeminiAudioBridge:
-    def __init__(self):
-        self._q = asyncio.Queue()
+    def __init__(
+        self,
+        drop_oldest: bool = True,
+        twilio_audio: bool = False,
+        session_id: Optional[str] = None,
+        local_vad: bool = True,
+    ):
+        # Twilio media streams carry 8 kHz μ-law; convert at the edges
+        self._codec: Optional[TwilioCodec] = (
+            TwilioCodec(INPUT_SAMPLE_RATE, OUTPUT_SAMPLE_RATE) if twilio_audio else None
+        )
+        self._buffer = PCMRingBuffer(
+            pcm_bytes(BUFFER_MS, INPUT_SAMPLE_RATE), drop_oldest=drop_oldest
+        )
+        self._packet_min = pcm_bytes(PACKET_MIN_MS, INPUT_SAMPLE_RATE)
+        self._packet_max = pcm_bytes(PACKET_MAX_MS, INPUT_SAMPLE_RATE)
+        self._output = PacketCoalescer(pcm_bytes(PACKET_MIN_MS, OUTPUT_SAMPLE_RATE))
         self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
         self._transcript = []
+        self._started = None
+        self.packets_sent = 0
+        self.packets_forwarded = 0
+
+        self.latency = latency.session(session_id or uuid.uuid4().hex)
+        # (buffer offset the chunk ends at, enqueue time) for unsent chunks
+        self._enqueued = deque(maxlen=1024)
+        self._voice_enqueued = None  # enqueue time of the last speech sent
+        self._voice_sent = None  # when the last speech packet was sent
+        self._response_at = None  # first byte of the current response
+        self._playback_pending = None  # first byte of a response not yet played
+
+        # Output waiting to be played, and the send in flight
+        self._playback = deque()
+        self._playback_ready = asyncio.Event()
+        self._playback_done = False
+        self._send_task: Optional[asyncio.Task] = None
+        self._on_interrupt: Optional[Callable[[], Awaitable[None]]] = None
+        self._vad = (
+            SpeechDetector(VOICE_RMS_THRESHOLD, BARGE_IN_MS) if local_vad else None
+        )
+        # Set after a local barge-in: drop the rest of the interrupted response
+        self._muted = False
+        self.interruptions = Counter()
 
     async def add_request(self, chunk: bytes):
-        """Called by Twilio‐media handler to enqueue raw PCM."""
-        await self._q.put(chunk)
+        """Called by Twilio‐media handler to enqueue raw PCM (or μ-law with twilio_audio)."""
+        if self._codec:
+            chunk = self._codec.decode(chunk)
+        await self._buffer.write(chunk)
+        self._enqueued.append((self._buffer.written, now()))
 
     async def terminate(self):
         """Signal end of stream."""
-        await self._q.put(None)
+        self._buffer.close()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._started if self._started else 0
+        return {
+            **self._buffer.stats(),
+            "packets_sent": self.packets_sent,
+            "packets_forwarded": self.packets_forwarded,
+            "sends_per_sec": self.packets_sent / elapsed if elapsed else 0.0,
+            "interruptions": dict(self.interruptions),
+        }
+
+    async def start(
+        self,
+        send_audio: Callable[[bytes], Awaitable[None]],
+        on_interrupt: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        """
+        Run the session. on_interrupt is awaited after a barge-in has flushed
+        local output, e.g. to send Twilio a "clear" message for audio it has
+        already buffered.
+        """
+        self._started = time.monotonic()
+        self._on_interrupt = on_interrupt
+        try:
+            async with self.client.aio.live.connect(
+                model=MODEL, config=CONFIG
+            ) as session:
+                send_task = asyncio.create_task(self._send_loop(session))
+                recv_task = asyncio.create_task(self._recv_loop(session))
+                play_task = asyncio.create_task(self._playback_loop(send_audio))
+                await asyncio.gather(send_task, recv_task, play_task)
+        finally:
+            self.latency.close()
 
-    async def start(self, send_audio: Callable[[bytes], Awaitable[None]]):
-        async with self.client.aio.live.connect(model=MODEL, config=CONFIG) as session:
-            send_task = asyncio.create_task(self._send_loop(session))
-            recv_task = asyncio.create_task(self._recv_loop(session, send_audio))
-            await asyncio.gather(send_task, recv_task)
+    async def interrupt(self, reason: str):
+        """Drop all pending output and cancel the send in flight."""
+        self.interruptions[reason] += 1
+        self._output.clear()
+        self._playback.clear()
+        if self._send_task is not None:
+            self._send_task.cancel()
+        self._response_at = None
+        self._playback_pending = None
+        if self._on_interrupt:
+            await self._on_interrupt()
 
     async def _send_loop(self, session: AsyncSession):
-        """Pull from queue and send PCM to Gemini"""
+        """Pull 20-40 ms packets from the ring buffer and send PCM to Gemini"""
         while True:
-            chunk = await self._q.get()
+            chunk = await self._buffer.read_packet(
+                self._packet_min, self._packet_max, PACKET_MIN_MS / 1000
+            )
             if chunk is None:
                 await session.send_client_content(
                     turns=Content(parts=[Part(audio=b"")], role="user"),
                     turn_complete=True,
                 )
                 break
+            first, last = self._packet_enqueue_times(len(chunk))
+            self.latency.record_since("queue_ms", first)
+            sent_at = now()
             await session.send_realtime_input(
                 audio=Blob(data=chunk, mime_type="audio/pcm")
             )
+            self.latency.record_since("send_ms", sent_at)
+            self.packets_sent += 1
+            if last is not None and pcm_rms(chunk) > VOICE_RMS_THRESHOLD:
+                self._voice_enqueued = last
+                self._voice_sent = sent_at
+            await self._detect_barge_in(chunk)
 
-    async def _recv_loop(
-        self,
-        session: AsyncSession,
-        send_audio: Callable[[bytes], Awaitable[None]],
-    ):
+    async def _detect_barge_in(self, chunk: bytes):
+        if self._vad is None:
+            return
+        speaking = self._response_at is not None or self._playback
+        if not speaking or self._muted:
+            self._vad.reset()
+            return
+        ms = len(chunk) / (INPUT_SAMPLE_RATE * 2) * 1000
+        if self._vad.update(chunk, ms):
+            self._vad.reset()
+            self._muted = True
+            await self.interrupt("local_vad")
+
+    def _packet_enqueue_times(self, size: int):
+        """Enqueue times of the oldest and newest chunk in the packet just read."""
+        end = self._buffer.written - len(self._buffer)
+        start = end - size
+        first = last = boundary = None
+        while self._enqueued and self._enqueued[0][0] <= end:
+            boundary, enqueued = self._enqueued.popleft()
+            if boundary > start and first is None:
+                first = enqueued
+            last = enqueued
+        if self._enqueued and boundary != end:
+            # The packet ends partway through the next chunk
+            last = self._enqueued[0][1]
+            if first is None:
+                first = last
+        return first, last
+
+    async def _recv_loop(self, session: AsyncSession):
         async for message in session.receive():
-            if data := message.data:
-                await send_audio(data)
+            content = message.server_content
+            if content and content.interrupted:
+                if not self._muted:
+                    await self.interrupt("server")
+                self._muted = False
+                continue
+            if (data := message.data) and not self._muted:
+                if self._response_at is None:
+                    self._response_at = self._playback_pending = now()
+                    self.latency.record_since("first_byte_ms", self._voice_sent)
+                if packet := self._output.add(data):
+                    self._play(packet)
+            if content and content.turn_complete:
+                if packet := self._output.flush():
+                    self._play(packet)
+                self._response_at = None
+                self._muted = False
             # if text := message.text:
             #     self._transcript.append(text)
+        self._playback_done = True
+        self._playback_ready.set()
+
+    def _play(self, packet: bytes):
+        self._playback.append(packet)
+        self._playback_ready.set()
+
+    async def _playback_loop(self, send_audio: Callable[[bytes], Awaitable[None]]):
+        while True:
+            while not self._playback:
+                if self._playback_done:
+                    return
+                self._playback_ready.clear()
+                await self._playback_ready.wait()
+            packet = self._playback.popleft()
+            self._send_task = asyncio.create_task(self._forward(send_audio, packet))
+            try:
+                await self._send_task
+            except asyncio.CancelledError:
+                # A barge-in cancels only the send; anything else stops the loop
+                if asyncio.current_task().cancelling():
+                    raise
+            finally:
+                self._send_task = None
+
+    async def _forward(
+        self, send_audio: Callable[[bytes], Awaitable[None]], packet: bytes
+    ):
+        self.packets_forwarded += 1
+        if self._codec:
+            packet = self._codec.encode(packet)
+        await send_audio(packet)
+        if self._playback_pending is not None:
+            self.latency.record_since("playback_ms", self._playback_pending)
+            self.latency.record_since("mouth_to_ear_ms", self._voice_enqueued)
+            self._playback_pending = None
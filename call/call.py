@@ -2,7 +2,6 @@ import os
 
 from dotenv import load_dotenv
 
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.frames.frames import EndFrame
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
@@ -18,6 +17,13 @@ from pipecat.services.gemini_multimodal_live.gemini import (
     GeminiMultimodalLiveLLMService,
 )
 
+from call.sessions import (
+    CallCapacityError,
+    CallSessionManager,
+    LatencyObserver,
+    session_manager,
+)
+
 load_dotenv()
 
 
@@ -36,13 +42,25 @@ Whether you are able to answer the user question or not, you are prohibited from
 """
 
 
-async def start_call(websocket_client, stream_sid):
+async def start_call(
+    websocket_client, stream_sid, sessions: CallSessionManager = session_manager
+):
+    try:
+        async with sessions.session(stream_sid) as session:
+            await run_call(websocket_client, stream_sid, sessions, session)
+    except CallCapacityError as e:
+        print(f"Rejecting call {stream_sid}: {e}")
+        # 1013: try again later
+        await websocket_client.close(code=1013)
+
+
+async def run_call(websocket_client, stream_sid, sessions, session):
     transport = FastAPIWebsocketTransport(
         websocket=websocket_client,
         params=FastAPIWebsocketParams(
             audio_out_enabled=True,
             vad_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(),
+            vad_analyzer=sessions.vad_analyzer(),
             vad_audio_passthrough=True,
             serializer=TwilioFrameSerializer(stream_sid),
         ),
@@ -76,7 +94,10 @@ async def start_call(websocket_client, stream_sid):
     task = PipelineTask(
         pipeline,
         params=PipelineParams(allow_interruptions=True),
-        observers=[RTVIObserver(rtvi)],
+        observers=[
+            RTVIObserver(rtvi),
+            LatencyObserver(session, llm, transport.output()),
+        ],
     )
 
     @rtvi.event_handler("on_client_ready")
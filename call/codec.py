@@ -0,0 +1,244 @@
+"""
+Conversion between Twilio media streams (8 kHz G.711 μ-law) and the 16-bit
+PCM the Gemini live model takes (16 kHz in, 24 kHz out).
+
+Everything works on whole frames with NumPy: μ-law goes through lookup
+tables and rate changes through a stateful polyphase FIR filter, so a 20 ms
+frame costs a handful of vectorized calls rather than a Python loop per
+sample. Run this module directly for a throughput benchmark.
+"""
+
+import math
+import time
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TWILIO_SAMPLE_RATE = 8000
+
+_BIAS = 0x84
+_CLIP = 32635
+
+
+def _build_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + _BIAS) << exponent) - _BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    # One entry per int16 value, indexed by its bit pattern as uint16
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), _CLIP) + _BIAS
+    exponent = np.minimum(np.floor(np.log2(magnitude >> 7 | 1)), 7).astype(np.int32)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+ULAW_DECODE = _build_decode_table()
+ULAW_ENCODE = _build_encode_table()
+
+
+def ulaw_decode(data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """μ-law bytes to int16 samples."""
+    codes = np.frombuffer(data, dtype=np.uint8)
+    if out is None:
+        return ULAW_DECODE[codes]
+    return np.take(ULAW_DECODE, codes, out=out[: len(codes)])
+
+
+def ulaw_encode(samples: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """int16 samples to μ-law codes."""
+    index = np.ascontiguousarray(samples, dtype=np.int16).view(np.uint16)
+    if out is None:
+        return ULAW_ENCODE[index]
+    return np.take(ULAW_ENCODE, index, out=out[: len(index)])
+
+
+def lowpass_taps(up: int, down: int, taps_per_phase: int) -> np.ndarray:
+    """Kaiser-windowed sinc anti-aliasing filter at the upsampled rate."""
+    num_taps = taps_per_phase * up
+    cutoff = 0.95 / (2 * max(up, down))  # cycles per upsampled sample
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+    # Unity DC gain per output phase
+    return taps * (up / taps.sum())
+
+
+class Resampler:
+    """
+    Stateful rational resampler (polyphase FIR) for a stream of int16 frames.
+
+    Filter history and the output phase carry over between calls, so frames
+    of any size can be fed in without clicks at the boundaries. Work and
+    output buffers are allocated once and regrown only for larger frames;
+    the returned array is reused by the next call.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, taps_per_phase: int = None):
+        g = math.gcd(src_rate, dst_rate)
+        self.up = dst_rate // g
+        self.down = src_rate // g
+        if taps_per_phase is None:
+            taps_per_phase = 24 * max(self.up, self.down) // self.up
+        self.taps_per_phase = taps_per_phase
+
+        taps = lowpass_taps(self.up, self.down, taps_per_phase).astype(np.float32)
+        # Row p holds phase p's taps reversed, to dot with a window of input
+        self._phases = taps.reshape(taps_per_phase, self.up).T[:, ::-1].copy()
+
+        g = math.gcd(self.up, self.down)
+        self._cycle = self.up // g
+        self._stride = self.down // g
+        self._history = taps_per_phase - 1
+        self._position = 0  # next output, in upsampled samples from frame start
+        self._work = np.zeros(self._history, dtype=np.float32)
+        self._reserve(320)
+
+    def _reserve(self, frame: int):
+        if len(self._work) >= self._history + frame:
+            return
+        work = np.zeros(self._history + frame, dtype=np.float32)
+        work[: self._history] = self._work[: self._history]
+        self._work = work
+        self._windows = sliding_window_view(work, self.taps_per_phase)
+        outputs = frame * self.up // self.down + 1
+        self._out = np.zeros(outputs, dtype=np.float32)
+        self._out16 = np.zeros(outputs, dtype=np.int16)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        n = len(samples)
+        self._reserve(n)
+        h = self._history
+        work = self._work[: h + n]
+        work[h:] = samples
+
+        # Output j sits at upsampled position p = position + j * down
+        limit = n * self.up
+        count = max(0, -(-(limit - self._position) // self.down))
+        out = self._out[:count]
+        windows = self._windows
+
+        # Outputs sharing a phase recur every `cycle` outputs and step
+        # `stride` inputs, so each phase is one strided matrix-vector product
+        cycle = self._cycle
+        stride = self._stride
+        for j in range(min(cycle, count)):
+            p = self._position + j * self.down
+            idx, phase = divmod(p, self.up)
+            k = len(range(j, count, cycle))
+            np.matmul(
+                windows[idx : idx + (k - 1) * stride + 1 : stride],
+                self._phases[phase],
+                out=out[j::cycle],
+            )
+
+        self._position += count * self.down - limit
+        work[:h] = work[n : n + h]
+
+        out16 = self._out16[:count]
+        np.clip(out, -32768, 32767, out=out)
+        np.rint(out, out=out)
+        out16[:] = out
+        return out16
+
+
+class TwilioCodec:
+    """
+    Per-call converter between Twilio μ-law payloads and model PCM16.
+
+    decode() turns 8 kHz μ-law into PCM at the model's input rate; encode()
+    turns model output PCM back into 8 kHz μ-law.
+    """
+
+    def __init__(self, input_rate: int = 16000, output_rate: int = 24000):
+        self._upsample = Resampler(TWILIO_SAMPLE_RATE, input_rate)
+        self._downsample = Resampler(output_rate, TWILIO_SAMPLE_RATE)
+        self._pcm = np.zeros(160, dtype=np.int16)
+        self._ulaw = np.zeros(160, dtype=np.uint8)
+
+    def decode(self, payload: bytes) -> bytes:
+        if len(self._pcm) < len(payload):
+            self._pcm = np.zeros(len(payload), dtype=np.int16)
+        pcm = ulaw_decode(payload, out=self._pcm)
+        return self._upsample.process(pcm).tobytes()
+
+    def encode(self, pcm: bytes) -> bytes:
+        # Drop a trailing half sample rather than fail on it
+        pcm = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype=np.int16)
+        samples = self._downsample.process(pcm)
+        if len(self._ulaw) < len(samples):
+            self._ulaw = np.zeros(len(samples), dtype=np.uint8)
+        return ulaw_encode(samples, out=self._ulaw).tobytes()
+
+
+def pcm_rms(pcm: bytes) -> float:
+    """Root mean square level of a PCM16 frame."""
+    samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype=np.int16)
+    if not len(samples):
+        return 0.0
+    samples = samples.astype(np.float32)
+    return float(np.sqrt(np.dot(samples, samples) / len(samples)))
+
+
+class SpeechDetector:
+    """
+    Energy VAD: reports speech once frames above an RMS threshold have
+    lasted min_speech_ms in a row.
+    """
+
+    def __init__(self, threshold: float = 500, min_speech_ms: float = 60):
+        self.threshold = threshold
+        self.min_speech_ms = min_speech_ms
+        self._speech_ms = 0.0
+
+    def update(self, pcm: bytes, ms: float) -> bool:
+        if pcm_rms(pcm) > self.threshold:
+            self._speech_ms += ms
+        else:
+            self._speech_ms = 0.0
+        return self._speech_ms >= self.min_speech_ms
+
+    def reset(self):
+        self._speech_ms = 0.0
+
+
+def benchmark(streams: int = 200, seconds: float = 5.0, frame_ms: int = 20):
+    """
+    Push `seconds` of audio both ways through `streams` codecs in 20 ms
+    frames, the way a Twilio call delivers it, and report how many real-time
+    streams one core sustains.
+    """
+    rng = np.random.default_rng(0)
+    codecs = [TwilioCodec() for _ in range(streams)]
+    inbound = ulaw_encode(
+        (rng.standard_normal(TWILIO_SAMPLE_RATE * frame_ms // 1000) * 3000).astype(
+            np.int16
+        )
+    ).tobytes()
+    outbound = (rng.standard_normal(24000 * frame_ms // 1000) * 3000).astype(np.int16)
+    outbound = outbound.tobytes()
+
+    frames = int(seconds * 1000 / frame_ms)
+    start = time.process_time()
+    for _ in range(frames):
+        for codec in codecs:
+            codec.decode(inbound)
+            codec.encode(outbound)
+    elapsed = time.process_time() - start
+
+    realtime = streams * seconds / elapsed
+    print(
+        f"{streams} streams x {seconds:g}s in {elapsed:.2f}s CPU: "
+        f"{realtime:.0f} concurrent real-time streams per core "
+        f"({elapsed / (streams * frames) * 1e6:.1f} us per 20 ms frame pair)"
+    )
+    return realtime
+
+
+if __name__ == "__main__":
+    benchmark()
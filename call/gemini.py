@@ -4,9 +4,13 @@ variable is set to the api-key you obtained from Google AI Studio.
 Important: **Use headphones**. This script uses the system default audio
 input and output, which often won't include echo cancellation. So to prevent
 the model from interrupting itself it is important that you use headphones.
+
+Run it from the repository root with `python -m call.gemini`; a latency
+summary is printed on exit.
 """
 
 import asyncio
+import json
 import os
 import sys
 import traceback
@@ -16,6 +20,9 @@ from dotenv import load_dotenv
 
 from google import genai
 
+from call.codec import SpeechDetector, pcm_rms
+from call.latency import latency, now
+
 if sys.version_info < (3, 11, 0):
     import taskgroup
     import exceptiongroup
@@ -30,6 +37,12 @@ RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
 
 MODEL = "models/gemini-2.0-flash-live-001"
+# Mic chunks louder than this count as speech when timing a turn
+VOICE_RMS_THRESHOLD = 500
+# Speech this long while the model is talking counts as a barge-in
+BARGE_IN_MS = 120
+# Playback is written in 20 ms slices so a barge-in stops it within one
+PLAYBACK_FRAME_BYTES = RECEIVE_SAMPLE_RATE * 2 * 20 // 1000
 
 # Load environment variables from .env file
 load_dotenv()
@@ -63,6 +76,19 @@ class AudioLoop:
         self.receive_audio_task = None
         self.play_audio_task = None
 
+        self.latency = latency.session("audio-loop")
+        self.voice_read_at = None  # mic read time of the last speech sent
+        self.voice_sent_at = None
+        self.response_at = None  # first byte of the current response
+        self.playback_pending = None  # first byte of a response not yet played
+
+        self.vad = SpeechDetector(VOICE_RMS_THRESHOLD, BARGE_IN_MS)
+        self.playing = False
+        # Bumped on every barge-in; playback stops writing older audio
+        self.flushes = 0
+        # Set after a local barge-in: drop the rest of the interrupted response
+        self.muted = False
+
     async def send_text(self):
         while True:
             text = await asyncio.to_thread(
@@ -75,12 +101,37 @@ class AudioLoop:
 
     async def send_realtime(self):
         while True:
-            msg = await self.out_queue.get()
+            read_at, msg = await self.out_queue.get()
             if msg.get("mime_type") == "audio/pcm":
+                self.latency.record_since("queue_ms", read_at)
+                sent_at = now()
                 await self.session.send(input=msg)
+                self.latency.record_since("send_ms", sent_at)
+                if pcm_rms(msg["data"]) > VOICE_RMS_THRESHOLD:
+                    self.voice_read_at = read_at
+                    self.voice_sent_at = sent_at
+                self.detect_barge_in(msg["data"])
             else:
                 print(f"Skipping non-audio message: {msg.get('mime_type')}")
 
+    def detect_barge_in(self, data: bytes):
+        speaking = self.playing or not self.audio_in_queue.empty()
+        if not speaking or self.muted:
+            self.vad.reset()
+            return
+        if self.vad.update(data, len(data) / (SEND_SAMPLE_RATE * 2) * 1000):
+            self.vad.reset()
+            self.muted = True
+            self.flush_playback()
+
+    def flush_playback(self):
+        """Drop queued model audio and stop the chunk being played."""
+        self.flushes += 1
+        while not self.audio_in_queue.empty():
+            self.audio_in_queue.get_nowait()
+        self.response_at = None
+        self.playback_pending = None
+
     async def listen_audio(self):
         mic_info = pya.get_default_input_device_info()
         self.audio_stream = await asyncio.to_thread(
@@ -98,22 +149,33 @@ class AudioLoop:
             kwargs = {}
         while True:
             data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-            await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
+            await self.out_queue.put((now(), {"data": data, "mime_type": "audio/pcm"}))
 
     async def receive_audio(self):
         "Background task to reads from the websocket and write pcm chunks to the output queue"
         while True:
             turn = self.session.receive()
             async for response in turn:
+                content = response.server_content
+                if content and content.interrupted:
+                    # The user barged in; flush now instead of after the turn
+                    if not self.muted:
+                        self.flush_playback()
+                    self.muted = False
+                    continue
+                if self.muted:
+                    continue
                 if data := response.data:
+                    if self.response_at is None:
+                        self.response_at = self.playback_pending = now()
+                        self.latency.record_since("first_byte_ms", self.voice_sent_at)
                     self.audio_in_queue.put_nowait(data)
                     continue
                 if text := response.text:
                     print(text, end="", flush=True)
             print()
-
-            while not self.audio_in_queue.empty():
-                self.audio_in_queue.get_nowait()
+            self.response_at = None
+            self.muted = False
 
     async def play_audio(self):
         stream = await asyncio.to_thread(
@@ -125,7 +187,20 @@ class AudioLoop:
         )
         while True:
             bytestream = await self.audio_in_queue.get()
-            await asyncio.to_thread(stream.write, bytestream)
+            flushes = self.flushes
+            self.playing = True
+            view = memoryview(bytestream)
+            for start in range(0, len(view), PLAYBACK_FRAME_BYTES):
+                if self.flushes != flushes:
+                    break
+                await asyncio.to_thread(
+                    stream.write, bytes(view[start : start + PLAYBACK_FRAME_BYTES])
+                )
+            self.playing = False
+            if self.playback_pending is not None:
+                self.latency.record_since("playback_ms", self.playback_pending)
+                self.playback_pending = None
+                self.latency.record_since("mouth_to_ear_ms", self.voice_read_at)
 
     async def run(self):
         try:
@@ -155,6 +230,7 @@ class AudioLoop:
             traceback.print_exception(EG)
         finally:
             pya.terminate()
+            print(json.dumps(self.latency.summary(), indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import math
+import time
+from typing import Optional
+
+# 2**5 linear sub-buckets per power of two: values are kept to within ~3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def now() -> float:
+    """Monotonic timestamp in seconds, the clock every stage is measured on."""
+    return time.perf_counter()
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in milliseconds.
+
+    Buckets are powers of two split into linear sub-buckets, so relative
+    error is bounded at any magnitude and recording is a frexp and a dict
+    increment. Percentiles are only computed when read.
+    """
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, ms: float):
+        if ms < 0:
+            return
+        mantissa, exponent = math.frexp(ms)
+        index = (exponent << SUB_BUCKET_BITS) + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @staticmethod
+    def _bucket_value(index: int) -> float:
+        # Midpoint of the bucket
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 0.5) / (2 * SUB_BUCKETS), exponent)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2),
+            "min": round(self.min, 2),
+            "max": round(self.max, 2),
+            **{f"p{q:g}": round(self.percentile(q), 2) for q in PERCENTILES},
+        }
+
+
+class SessionLatency:
+    """Per-session histograms, one per stage, that also feed the totals."""
+
+    def __init__(self, registry: "LatencyRegistry", session_id: str):
+        self.registry = registry
+        self.session_id = session_id
+        self.stages: dict[str, LatencyHistogram] = {}
+
+    def record(self, stage: str, ms: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(ms)
+
+    def record_since(self, stage: str, start: Optional[float]):
+        if start is not None:
+            self.record(stage, (now() - start) * 1000)
+
+    def close(self):
+        self.registry.close(self.session_id)
+
+    def summary(self) -> dict:
+        return {stage: h.summary() for stage, h in sorted(self.stages.items())}
+
+
+class LatencyRegistry:
+    """
+    Latency histograms for live sessions, plus per-stage totals that closed
+    sessions are folded into.
+    """
+
+    def __init__(self):
+        self.sessions: dict[str, SessionLatency] = {}
+        self.closed: dict[str, LatencyHistogram] = {}
+
+    def session(self, session_id: str) -> SessionLatency:
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = SessionLatency(self, session_id)
+        return session
+
+    def close(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        for stage, histogram in session.stages.items():
+            self.closed.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+    def totals(self) -> dict[str, LatencyHistogram]:
+        totals = {}
+        for stage, histogram in self.closed.items():
+            totals.setdefault(stage, LatencyHistogram()).merge(histogram)
+        for session in self.sessions.values():
+            for stage, histogram in session.stages.items():
+                totals.setdefault(stage, LatencyHistogram()).merge(histogram)
+        return totals
+
+    def snapshot(self) -> dict:
+        return {
+            "stages": {
+                stage: h.summary() for stage, h in sorted(self.totals().items())
+            },
+            "sessions": {
+                session_id: session.summary()
+                for session_id, session in self.sessions.items()
+            },
+        }
+
+
+# Shared by every call running in this process
+latency = LatencyRegistry()
@@ -0,0 +1,236 @@
+import asyncio
+import copy
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from importlib.resources import files
+from typing import Optional
+
+import numpy as np
+from pipecat.audio.vad.silero import SileroOnnxModel
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import (
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    OutputAudioRawFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.observers.base_observer import BaseObserver
+
+from call.latency import latency
+
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "20"))
+MAX_WAITING_CALLS = int(os.getenv("MAX_WAITING_CALLS", "20"))
+CALL_QUEUE_TIMEOUT_SEC = float(os.getenv("CALL_QUEUE_TIMEOUT_SEC", "10"))
+
+# The Silero model shipped with pipecat, and how often a session clears its
+# recurrent state (as pipecat's own SileroVADAnalyzer does)
+SILERO_MODEL = files("pipecat.audio.vad.data").joinpath("silero_vad.onnx")
+VAD_RESET_STATES_SEC = 5.0
+
+# Frames that show the LLM has started answering
+LLM_FIRST_BYTE_FRAMES = (
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TTSStartedFrame,
+    TTSAudioRawFrame,
+)
+
+
+class CallCapacityError(Exception):
+    pass
+
+
+class SharedSileroVADAnalyzer(VADAnalyzer):
+    """
+    Silero VAD that reuses an already loaded ONNX model.
+
+    The InferenceSession (the weights) is shared by every call; each analyzer
+    gets a shallow copy of the model wrapper with its own recurrent state, so
+    inference stays per-session. Built on the public VADAnalyzer interface
+    rather than SileroVADAnalyzer, whose constructor always loads a model.
+    """
+
+    def __init__(
+        self, model: SileroOnnxModel, *, sample_rate: Optional[int] = None, params=None
+    ):
+        super().__init__(sample_rate=sample_rate, params=params or VADParams())
+        self.model = copy.copy(model)
+        self.model.reset_states()
+        self.last_reset = 0.0
+
+    def set_sample_rate(self, sample_rate: int):
+        if sample_rate not in (8000, 16000):
+            raise ValueError(f"Silero VAD needs 8000 or 16000 Hz, got {sample_rate}")
+        super().set_sample_rate(sample_rate)
+
+    def num_frames_required(self) -> int:
+        return 512 if self.sample_rate == 16000 else 256
+
+    def voice_confidence(self, buffer) -> float:
+        try:
+            audio = np.frombuffer(buffer, np.int16).astype(np.float32) / 32768.0
+            confidence = self.model(audio, self.sample_rate)[0]
+        except Exception as e:
+            print(f"Error running Silero VAD: {e}")
+            return 0.0
+        now = time.time()
+        if now - self.last_reset >= VAD_RESET_STATES_SEC:
+            self.model.reset_states()
+            self.last_reset = now
+        return float(confidence)
+
+
+class CallSession:
+    def __init__(self, stream_sid: str, waited_sec: float):
+        self.id = uuid.uuid4().hex
+        self.stream_sid = stream_sid
+        self.started = time.time()
+        self.waited_sec = waited_sec
+        # (stop -> LLM first byte, stop -> first audio out) per turn, in ms
+        self.turns = deque(maxlen=100)
+
+    def stats(self) -> dict:
+        llm = [t[0] for t in self.turns if t[0] is not None]
+        audio = [t[1] for t in self.turns if t[1] is not None]
+        return {
+            "stream_sid": self.stream_sid,
+            "duration_sec": round(time.time() - self.started, 1),
+            "queued_sec": round(self.waited_sec, 3),
+            "turns": len(self.turns),
+            "llm_first_byte_ms": _summary(llm),
+            "first_audio_ms": _summary(audio),
+        }
+
+
+def _summary(values: list[float]) -> Optional[dict]:
+    if not values:
+        return None
+    return {
+        "last": round(values[-1], 1),
+        "mean": round(sum(values) / len(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+class LatencyObserver(BaseObserver):
+    """
+    Times each turn of a call: the user stops speaking (VAD), the LLM pushes
+    its first frame, and the first audio frame reaches the output transport.
+    """
+
+    def __init__(self, session: CallSession, llm, output):
+        super().__init__()
+        self.session = session
+        self.latency = latency.session(session.id)
+        self.llm = llm
+        self.output = output
+        self._stop_frame = None
+        self._stopped_at = None
+        self._llm_ms = None
+
+    async def on_push_frame(self, src, dst, frame, direction, timestamp):
+        now = time.perf_counter()
+        if isinstance(frame, UserStoppedSpeakingFrame):
+            # The same frame is seen again at every hop through the pipeline
+            if frame.id != self._stop_frame:
+                self._finish_turn(None)
+                self._stop_frame = frame.id
+                self._stopped_at = now
+                self._llm_ms = None
+            return
+        if self._stopped_at is None:
+            return
+        if (
+            self._llm_ms is None
+            and src is self.llm
+            and isinstance(frame, LLM_FIRST_BYTE_FRAMES)
+        ):
+            self._llm_ms = (now - self._stopped_at) * 1000
+        elif dst is self.output and isinstance(frame, OutputAudioRawFrame):
+            self._finish_turn((now - self._stopped_at) * 1000)
+
+    def _finish_turn(self, audio_ms: Optional[float]):
+        if self._stopped_at is None:
+            return
+        self.session.turns.append((self._llm_ms, audio_ms))
+        if self._llm_ms is not None:
+            self.latency.record("llm_first_byte_ms", self._llm_ms)
+        if audio_ms is not None:
+            self.latency.record("first_audio_ms", audio_ms)
+        self._stopped_at = None
+
+
+class CallSessionManager:
+    """
+    Tracks live call pipelines and caps how many run at once.
+
+    Calls over the limit wait in a bounded queue for a free slot and are
+    rejected once the queue is full or the wait times out. The Silero VAD
+    model is loaded once and shared by every session's analyzer.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_CONCURRENT_CALLS,
+        max_waiting: int = MAX_WAITING_CALLS,
+        queue_timeout: float = CALL_QUEUE_TIMEOUT_SEC,
+    ):
+        self.max_sessions = max_sessions
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.sessions: dict[str, CallSession] = {}
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_sessions)
+        self._vad_model = None
+
+    def vad_analyzer(self, **kwargs) -> SharedSileroVADAnalyzer:
+        if self._vad_model is None:
+            self._vad_model = SileroOnnxModel(str(SILERO_MODEL), force_onnx_cpu=True)
+        return SharedSileroVADAnalyzer(self._vad_model, **kwargs)
+
+    @asynccontextmanager
+    async def session(self, stream_sid: str):
+        # Only calls that would have to wait count against the queue
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise CallCapacityError("Call queue is full")
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise CallCapacityError("Timed out waiting for a call slot")
+        finally:
+            self.waiting -= 1
+
+        session = CallSession(stream_sid, time.perf_counter() - queued)
+        self.sessions[session.id] = session
+        try:
+            yield session
+        finally:
+            del self.sessions[session.id]
+            latency.close(session.id)
+            self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "sessions": [s.stats() for s in self.sessions.values()],
+        }
+
+
+session_manager = CallSessionManager()
@@ -0,0 +1,167 @@
+import re
+from typing import Optional
+
+# Agent sentences that carry nothing an extraction needs
+BOILERPLATE = [
+    re.compile(p, re.IGNORECASE)
+    for p in [
+        r"^(hi|hello|hey)\b",
+        r"\bthis is \w+ from\b",
+        r"\bhow are you\b",
+        r"^((great|perfect|wonderful|awesome|okay|ok|got it|sure|alright|thanks?)\W*)+$",
+        r"\bthanks? (you )?for (the )?clarif",
+        r"\bjust a reminder that\b",
+        r"\bcompletely flexible\b",
+        r"\b(any questions|anything else)\b",
+        r"\bexcited to help\b",
+        r"\bwrap things up\b",
+        r"\bhave a \w+ (day|evening|night)\b",
+        r"\btalk to you\b",
+    ]
+]
+
+# Agent restatements the user is asked to confirm
+CONFIRMATION = re.compile(
+    r"\b(is that (all )?(right|correct)|does that sound|to make sure|"
+    r"let's make sure|so,? we'll|so,? in addition|you'd (also )?like)\b",
+    re.IGNORECASE,
+)
+
+# Times and dates; any mentioned in the original must survive compaction
+FACT = re.compile(
+    r"\b(\d{1,2}(:\d{2})?\s*(am|pm|a\.m\.|p\.m\.)|noon|midnight|"
+    r"(mon|tues|wednes|thurs|fri|satur|sun)days?|weekdays?|weekends?|"
+    r"today|tonight|tomorrow|every (day|morning|evening|night|week)|daily|"
+    r"(jan|feb|mar|apr|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2})\b",
+    re.IGNORECASE,
+)
+
+TURN = re.compile(r"^\s*(Agent|User)\s*:\s*(.*)$", re.IGNORECASE)
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"[a-z0-9']+")
+
+# A user reply this short needs the agent turn before it for context
+SHORT_REPLY_WORDS = 4
+# An agent turn mostly repeated by a later one is dropped
+RESTATEMENT_OVERLAP = 0.7
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for reporting savings"""
+    return (len(text) + 3) // 4
+
+
+def parse_turns(transcript: str) -> list[tuple[str, str]]:
+    """
+    Split an "Agent: ... / User: ..." transcript into (speaker, text) turns,
+    joining continuation lines and consecutive turns of one speaker
+    """
+    turns: list[list[str]] = []
+    for line in transcript.splitlines():
+        match = TURN.match(line)
+        if match:
+            speaker, text = match.group(1).capitalize(), match.group(2).strip()
+            if turns and turns[-1][0] == speaker:
+                turns[-1][1] += " " + text
+            else:
+                turns.append([speaker, text])
+        elif line.strip() and turns:
+            turns[-1][1] += " " + line.strip()
+    return [(speaker, text.strip()) for speaker, text in turns]
+
+
+def _facts(text: str) -> set[str]:
+    return {" ".join(m.group(0).lower().split()) for m in FACT.finditer(text)}
+
+
+def _content_words(text: str) -> set[str]:
+    return {w for w in WORD.findall(text.lower()) if len(w) > 3}
+
+
+def _strip_boilerplate(text: str) -> str:
+    sentences = [
+        s for s in SENTENCE.split(text) if not any(p.search(s) for p in BOILERPLATE)
+    ]
+    return " ".join(sentences).strip()
+
+
+class TranscriptCompactor:
+    """
+    Shrinks a call transcript before extraction.
+
+    User turns are kept verbatim. Agent turns are reduced to what gives the
+    user's words meaning: the restatements the user confirmed, and the
+    question before a short reply like "Yes". Greetings and other agent
+    boilerplate are dropped, and so is a restatement repeated by a later one.
+    A dropped agent turn mentioning a time or date the kept text lacks is
+    put back, so no scheduling detail is lost. Transcripts without
+    Agent:/User: turns are passed through unchanged.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def compact(self, transcript: str) -> str:
+        turns = parse_turns(transcript)
+        compacted = self._compact_turns(turns) if turns else None
+        if compacted is None or len(compacted) >= len(transcript):
+            compacted = transcript
+
+        self.calls += 1
+        self.tokens_in += estimate_tokens(transcript)
+        self.tokens_out += estimate_tokens(compacted)
+        return compacted
+
+    def _compact_turns(self, turns: list[tuple[str, str]]) -> Optional[str]:
+        keep: list[Optional[str]] = [None] * len(turns)
+        for i, (speaker, text) in enumerate(turns):
+            if speaker == "User":
+                keep[i] = text
+                continue
+            stripped = _strip_boilerplate(text)
+            if not stripped:
+                continue
+            next_user = turns[i + 1][1] if i + 1 < len(turns) else ""
+            short_reply = 0 < len(next_user.split()) <= SHORT_REPLY_WORDS
+            if CONFIRMATION.search(stripped) or short_reply:
+                keep[i] = stripped
+
+        # A restatement mostly repeated later is superseded by the later one
+        agent = [i for i, (speaker, _) in enumerate(turns) if speaker == "Agent"]
+        for n, i in enumerate(agent):
+            if keep[i] is None:
+                continue
+            words = _content_words(keep[i])
+            for j in agent[n + 1 :]:
+                if keep[j] is None or not words:
+                    continue
+                if (
+                    len(words & _content_words(keep[j])) / len(words)
+                    >= RESTATEMENT_OVERLAP
+                ):
+                    keep[i] = None
+                    break
+
+        # Restore dropped agent turns carrying times or dates found nowhere else
+        kept_facts = set().union(*(_facts(t) for t in keep if t))
+        for i, (speaker, text) in enumerate(turns):
+            if keep[i] is None and speaker == "Agent":
+                missing = _facts(text) - kept_facts
+                if missing:
+                    keep[i] = _strip_boilerplate(text) or text
+                    kept_facts |= _facts(keep[i])
+
+        lines = [f"{turns[i][0]}: {t}" for i, t in enumerate(keep) if t]
+        return "\n".join(lines) if lines else None
+
+    def stats(self) -> dict:
+        saved = self.tokens_in - self.tokens_out
+        return {
+            "calls": self.calls,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self.tokens_in, 3) if self.tokens_in else 0.0,
+        }
@@ -0,0 +1,89 @@
+import datetime
+from typing import Callable, Optional
+
+
+class DeadlineSync:
+    """
+    Turns upcoming Canvas due dates into reminder calls.
+
+    An index of (course, assignment) -> due date is loaded once from the
+    reminders collection and kept in memory, so each sync only writes and
+    schedules the deadlines that are new or have moved. Reminders for
+    assignments missing from a sync, because they were submitted, removed or
+    are past due, are deleted and their calls cancelled.
+    """
+
+    def __init__(
+        self,
+        repository,
+        schedule: Callable[[dict], None],
+        cancel: Callable[[str], None],
+        phone: Optional[str],
+        lead_hours: float = 12,
+    ):
+        self.repository = repository
+        self.schedule = schedule
+        self.cancel = cancel
+        self.phone = phone
+        self.lead = datetime.timedelta(hours=lead_hours)
+        self._index: Optional[dict[str, str]] = None
+
+    async def sync(self, deadlines: list[dict]) -> int:
+        """
+        Apply the complete list of upcoming unsubmitted deadlines, returning
+        how many were added, moved or removed
+        """
+        if self._index is None:
+            self._index = await self.repository.deadline_due_dates()
+
+        now = datetime.datetime.now()
+        changed = []
+        current = set()
+        for deadline in deadlines:
+            key = f"{deadline['course_id']}:{deadline['assignment_id']}"
+            current.add(key)
+            if self._index.get(key) == deadline["due_at"]:
+                continue
+
+            # Canvas due dates are UTC; reminders run on local wall-clock time
+            due = datetime.datetime.fromisoformat(
+                deadline["due_at"].replace("Z", "+00:00")
+            ).astimezone()
+            run_at = due.replace(tzinfo=None) - self.lead
+            changed.append(
+                {
+                    "type": "reminder",
+                    "deadline": key,
+                    "due_at": deadline["due_at"],
+                    "date": run_at.strftime("%Y-%m-%d"),
+                    "time": run_at.strftime("%H:%M"),
+                    "run_at": run_at,
+                    "description": (
+                        f"{deadline['name']} for {deadline['course_name']} "
+                        f"is due {due.strftime('%A at %I:%M %p')}"
+                    ),
+                    "phone": self.phone,
+                    "created_at": now.isoformat(),
+                }
+            )
+
+        removed = [key for key in self._index if key not in current]
+        if removed:
+            await self.repository.delete_deadline_reminders(removed)
+            for key in removed:
+                del self._index[key]
+                self.cancel(key)
+
+        if changed:
+            await self.repository.save_deadline_reminders(changed)
+        for item in changed:
+            self._index[item["deadline"]] = item["due_at"]
+            if item["run_at"] > now:
+                self.schedule(item)
+            else:
+                # Due sooner than the lead time; drop any call for the old date
+                print(
+                    f"Not reminding about {item['deadline']}: due within the lead time"
+                )
+                self.cancel(item["deadline"])
+        return len(changed) + len(removed)
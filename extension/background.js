@@ -1,29 +1,117 @@
 const RECORD_INTERVAL_MIN = 0.5;   // 30 seconds
-const REPORT_INTERVAL_MIN = 1;     // 1 minutes
+const REPORT_INTERVAL_MIN = 1;     // 1 minutes; checked locally
+const USAGE_SYNC_INTERVAL_MIN = 15; // full usage upload for the stats
+const SNAPSHOT_INTERVAL_MIN = 5;
 
+const SERVER_URL = 'http://localhost:8000';
 const TIMES_KEY = 'activeTimes';
+const SNAPSHOT_KEY = 'restrictionSnapshot';
+const CLIENT_KEY = 'usageClient';   // client id, last sequence number, unsent batch
+const SENT_KEY = 'sentTimes';       // totals the server has acknowledged
+// Must match BLOOM_SEEDS in restrictions.py
+const BLOOM_SEEDS = [0x811c9dc5, 0x9747b28c];
 
 // On install/startup, schedule our 30-second alarm
 chrome.runtime.onInstalled.addListener(init);
 chrome.runtime.onStartup.addListener(init);
 
-function init() {
+async function init() {
     // Record every 30 s
     chrome.alarms.create('recordActiveTime', {
         periodInMinutes: RECORD_INTERVAL_MIN
     });
-    // Report every 5 min
+    // Check for restricted hosts every minute, locally
     chrome.alarms.create('sendUsage', {
         periodInMinutes: REPORT_INTERVAL_MIN
     });
-    chrome.storage.local.set({ [TIMES_KEY]: {} });
+    chrome.alarms.create('syncUsage', {
+        periodInMinutes: USAGE_SYNC_INTERVAL_MIN
+    });
+    chrome.alarms.create('syncRestrictions', {
+        periodInMinutes: SNAPSHOT_INTERVAL_MIN
+    });
+    // Active times restart from zero, so do the acknowledged totals
+    const client = (await chrome.storage.local.get(CLIENT_KEY))[CLIENT_KEY];
+    if (client?.pending) client.pending.totals = {};
+    await chrome.storage.local.set({
+        [TIMES_KEY]: {},
+        [SENT_KEY]: {},
+        ...(client && { [CLIENT_KEY]: client })
+    });
+    syncRestrictions();
 }
 
 chrome.alarms.onAlarm.addListener(async alarm => {
     if (alarm.name === 'recordActiveTime') recordActiveTime();
-    else if (alarm.name === 'sendUsage') sendUsageReport();
+    else if (alarm.name === 'sendUsage') checkRestrictions();
+    else if (alarm.name === 'syncUsage') sendUsageReport();
+    else if (alarm.name === 'syncRestrictions') syncRestrictions();
 });
 
+// Fetch the restricted hostname snapshot unless ours is still current
+async function syncRestrictions() {
+    const stored = (await chrome.storage.local.get(SNAPSHOT_KEY))[SNAPSHOT_KEY];
+    const headers = stored ? { 'If-None-Match': stored.etag } : {};
+    try {
+        const res = await fetch(`${SERVER_URL}/api/restrictions/snapshot`, { headers });
+        if (res.status === 304) return;
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        await chrome.storage.local.set({ [SNAPSHOT_KEY]: await res.json() });
+    }
+    catch (error) {
+        console.error('Error syncing restrictions:', error);
+    }
+}
+
+// Report to the server only when a tracked host looks restricted
+async function checkRestrictions() {
+    const snapshot = (await chrome.storage.local.get(SNAPSHOT_KEY))[SNAPSHOT_KEY];
+    if (!snapshot) return sendUsageReport();
+
+    const contains = snapshotMatcher(snapshot);
+    const times = await getTimes();
+    if (Object.keys(times).some(hostname => isRestricted(hostname, contains))) {
+        await sendUsageReport();
+    }
+}
+
+// Same normalization and parent-domain walk as restrictions.py
+function isRestricted(hostname, contains) {
+    hostname = hostname.trim().toLowerCase().split(':')[0].replace(/\.$/, '');
+    if (hostname.startsWith('www.')) hostname = hostname.slice(4);
+    const labels = hostname.split('.');
+    for (let i = 0; i < Math.max(labels.length - 1, 1); i++) {
+        if (contains(labels.slice(i).join('.'))) return true;
+    }
+    return false;
+}
+
+function snapshotMatcher(snapshot) {
+    if (snapshot.hostnames) {
+        const hostnames = new Set(snapshot.hostnames);
+        return hostname => hostnames.has(hostname);
+    }
+    // Bloom filter: a false positive only costs a server round trip
+    const { m, k } = snapshot.bloom;
+    const bits = Uint8Array.from(atob(snapshot.bloom.bits), c => c.charCodeAt(0));
+    return hostname => {
+        const [h1, h2] = BLOOM_SEEDS.map(seed => fnv1a(hostname, seed));
+        for (let j = 0; j < k; j++) {
+            const i = (h1 + j * h2) % m;
+            if (!(bits[i >> 3] & (1 << (i & 7)))) return false;
+        }
+        return true;
+    };
+}
+
+function fnv1a(text, seed) {
+    let h = seed;
+    for (const byte of new TextEncoder().encode(text)) {
+        h = Math.imul(h ^ byte, 0x01000193);
+    }
+    return h >>> 0;
+}
+
 async function recordActiveTime() {
     console.log('Recording active time...');
     const [tab] = await chrome.tabs.query({
@@ -44,30 +132,67 @@ async function recordActiveTime() {
     await chrome.storage.local.set({ [TIMES_KEY]: times });
 }
 
+// Send the seconds added per host since the last acknowledged report. A
+// failed batch is resent unchanged with the same sequence number, so the
+// server can drop it as a replay if it was in fact received.
 async function sendUsageReport() {
-    let times = await getTimes();
-    const date = new Date().toLocaleDateString();
-    const email = (await chrome.identity.getProfileUserInfo()).email;
-    const records = Object.entries(times).map(
-        ([hostname, active_sec]) => ({ date, email, hostname, active_sec })
-    );
+    const times = await getTimes();
+    const state = await chrome.storage.local.get([CLIENT_KEY, SENT_KEY]);
+    const client = state[CLIENT_KEY] || { id: crypto.randomUUID(), seq: 0, pending: null };
+    const sent = state[SENT_KEY] || {};
 
-    if (records.length === 0) return;
+    if (!client.pending) {
+        const deltas = {};
+        for (const [hostname, total] of Object.entries(times)) {
+            const previous = sent[hostname] || 0;
+            // A smaller total means the counter was reset
+            const delta = total >= previous ? total - previous : total;
+            if (delta > 0) deltas[hostname] = delta;
+        }
+        if (Object.keys(deltas).length === 0) return;
+        client.pending = {
+            client_id: client.id,
+            seq: client.seq + 1,
+            email: (await chrome.identity.getProfileUserInfo()).email,
+            date: localISODate(),
+            deltas,
+            totals: { ...times }
+        };
+        await chrome.storage.local.set({ [CLIENT_KEY]: client });
+    }
 
-    console.log('Sending usage alert...', records);
+    const { totals, ...batch } = client.pending;
+    console.log('Sending usage report...', batch);
 
     try {
-        const res = await fetch('http://localhost:8000/browser-usage', {
+        const body = await new Response(
+            new Blob([JSON.stringify(batch)]).stream().pipeThrough(new CompressionStream('gzip'))
+        ).arrayBuffer();
+        const res = await fetch(`${SERVER_URL}/browser-usage/v2`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(records)
+            headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+            body
         });
-        data = res.json();
+        if (res.status === 400) {
+            // Malformed, e.g. built by an older version; rebuild it next time
+            client.pending = null;
+            await chrome.storage.local.set({ [CLIENT_KEY]: client });
+            throw new Error('Usage report rejected (HTTP 400)');
+        }
+        // 409: this sequence number was already received
+        if (!res.ok && res.status !== 409) throw new Error(`HTTP ${res.status}`);
+        const data = res.ok ? await res.json() : {};
+
+        client.seq = batch.seq;
+        client.pending = null;
+        const updates = { [CLIENT_KEY]: client, [SENT_KEY]: totals };
         if (data["notified"]) {
-            let hostname = data["hostname"];
-            times = times.filter((t, h) => h !== hostname);
-            await chrome.storage.local.set({ [TIMES_KEY]: times });
+            const current = await getTimes();
+            delete current[data["hostname"]];
+            delete totals[data["hostname"]];
+            updates[TIMES_KEY] = current;
         }
+        await chrome.storage.local.set(updates);
         console.log('Usage report sent successfully');
     }
     catch (error) {
@@ -75,6 +200,12 @@ async function sendUsageReport() {
     }
 }
 
+// Local calendar date as YYYY-MM-DD, the form the server keys days on
+function localISODate(date = new Date()) {
+    const pad = n => String(n).padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+}
+
 async function getTimes() {
     const data = await chrome.storage.local.get(TIMES_KEY);
     const times = data[TIMES_KEY] || {};
@@ -0,0 +1,185 @@
+import datetime
+import json
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+# Bump whenever the extraction prompt changes so cached results are not reused
+PROMPT_VERSION = "4"
+
+
+class Restriction(BaseModel):
+    hostname: str
+    description: str
+    phone: Optional[str] = None
+
+
+class Reminder(BaseModel):
+    date: str
+    time: str
+    description: str
+    phone: Optional[str] = None
+    days: Optional[str] = None
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        datetime.datetime.strptime(value, "%Y-%m-%d")
+        return value
+
+    @field_validator("time")
+    @classmethod
+    def check_time(cls, value: str) -> str:
+        return datetime.datetime.strptime(value, "%H:%M").strftime("%H:%M")
+
+    @field_validator("days")
+    @classmethod
+    def check_days(cls, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        # Imported here so the schema and prompt load without the scheduler
+        from apscheduler.triggers.cron import CronTrigger
+
+        # Raises ValueError for anything that is not a day-of-week expression
+        CronTrigger(day_of_week=value)
+        return value
+
+
+class Extraction(BaseModel):
+    restrictions: list[Restriction]
+    reminders: list[Reminder]
+
+
+# Response array name -> (action type, model validating each item)
+ITEM_MODELS = {
+    "restrictions": ("restriction", Restriction),
+    "reminders": ("reminder", Reminder),
+}
+
+
+def build_prompt(transcript: str, user_phone: str, now: str) -> str:
+    return f"""
+Analyze the following transcript from a phone call and find every request for:
+1. Setting a restriction on a website
+2. Setting a reminder for a task
+
+THERE ARE CAN BE MULTIPLE RESTRICTIONS AND REMINDERS IN THE TRANSCRIPT. PLEASE REVIEW AND RETURN ALL OF THEM.
+UNDERSTAND what user wants, identify all reminders and it can have multiple times. identify all restrictions and it can have multiple hostnames.
+If a reminder repeats, return it ONCE with a "days" field instead of one reminder per day.
+
+For each restriction, extract:
+- hostname (the website to restrict, e.g. "www.facebook.com")
+- description (reason for restriction)
+- phone number
+
+For each reminder, extract:
+- date (in YYYY-MM-DD format, use today's date if not specified)
+- time (in HH:MM 24-hour format)
+- description (what to remind about)
+- phone number
+- days (only for repeating reminders: a cron day-of-week expression such as "*" for every day, "mon-fri" for weekdays or "fri" for every Friday; date is then the first day it applies)
+
+The user's phone number is {user_phone}. Today's date is {now}.
+
+Transcript: {transcript}
+"""
+
+
+def gemini_schema(model: type[BaseModel]) -> dict:
+    """
+    Convert a Pydantic model to the OpenAPI subset Gemini's response_schema takes
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            return convert(defs[node["$ref"].split("/")[-1]])
+        if "anyOf" in node:
+            # Optional[X] comes out as anyOf [X, null]
+            options = [o for o in node["anyOf"] if o.get("type") != "null"]
+            return {**convert(options[0]), "nullable": True}
+        if node.get("type") == "object":
+            return {
+                "type": "object",
+                "properties": {
+                    name: convert(prop) for name, prop in node["properties"].items()
+                },
+                "required": node.get("required", []),
+            }
+        if node.get("type") == "array":
+            return {"type": "array", "items": convert(node["items"])}
+        return {"type": node["type"]}
+
+    return convert(schema)
+
+
+RESPONSE_SCHEMA = gemini_schema(Extraction)
+
+
+class ActionStreamParser:
+    """
+    Incremental parser for a streamed {"restrictions": [...], "reminders": [...]}
+    response.
+
+    Text is fed in as it arrives and every item object is returned as soon as
+    its closing brace is seen, validated on its own so one malformed item does
+    not discard the rest of the response.
+    """
+
+    def __init__(self):
+        self.invalid = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: list[str] = []
+        self._last_string = None
+        self._array = None
+        self._item: Optional[list[str]] = None
+
+    def feed(self, text: str) -> list[dict]:
+        items = []
+        for c in text:
+            if self._item is not None:
+                self._item.append(c)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                elif self._depth == 1:
+                    # Only top-level keys are needed outside of items
+                    self._string.append(c)
+            elif c == '"':
+                self._in_string = True
+                self._string = []
+            elif c in "{[":
+                self._depth += 1
+                if c == "[" and self._depth == 2:
+                    self._array = self._last_string
+                elif c == "{" and self._depth == 3 and self._item is None:
+                    self._item = ["{"]
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._depth == 2 and self._item is not None:
+                    item = self._validate("".join(self._item))
+                    if item is not None:
+                        items.append(item)
+                    self._item = None
+        return items
+
+    def _validate(self, raw: str) -> Optional[dict]:
+        action_type, model = ITEM_MODELS.get(self._array, (None, None))
+        if model is None:
+            return None
+        try:
+            item = model.model_validate(json.loads(raw)).model_dump()
+        except (json.JSONDecodeError, ValidationError) as e:
+            self.invalid += 1
+            print(f"Skipping invalid {action_type}: {e}")
+            return None
+        return {"type": action_type, **item}
@@ -0,0 +1,102 @@
+import copy
+import datetime
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_transcript(transcript: str) -> str:
+    """
+    Collapse whitespace and case so trivially different copies hash the same
+    """
+    return " ".join(transcript.lower().split())
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of the actions extracted from a transcript.
+
+    Entries live in a bounded in-memory LRU with a TTL. When a MongoDB
+    collection is given it is used as a second tier, so other workers and
+    restarts can reuse extractions; a TTL index expires those documents.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_sec: int = 86400, collection=None):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.collection = collection
+        self._entries: OrderedDict[str, tuple[float, list]] = OrderedDict()
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        transcript: str, user_phone: str, prompt_version: str, day: datetime.date
+    ) -> str:
+        """
+        Hash everything the extraction depends on. The day bucket keeps
+        relative dates like "tomorrow" from being answered with yesterday's result.
+        """
+        payload = "\0".join(
+            [
+                prompt_version,
+                day.isoformat(),
+                user_phone or "",
+                normalize_transcript(transcript),
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def create_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, actions = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(actions)
+            del self._entries[key]
+
+        if self.collection is not None:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.datetime.now()}}
+            )
+            if doc is not None:
+                self.mongo_hits += 1
+                self._remember(key, doc["actions"])
+                return copy.deepcopy(doc["actions"])
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, actions: list):
+        self._remember(key, copy.deepcopy(actions))
+        if self.collection is not None:
+            expires_at = datetime.datetime.now() + datetime.timedelta(
+                seconds=self.ttl_sec
+            )
+            await self.collection.replace_one(
+                {"_id": key},
+                {"_id": key, "actions": actions, "expires_at": expires_at},
+                upsert=True,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+        }
+
+    def _remember(self, key: str, actions: list):
+        self._entries[key] = (time.monotonic() + self.ttl_sec, actions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -5,6 +5,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { ScrollArea } from "@/components/ui/scroll-area";
+import { Button } from "@/components/ui/button";
 import { formatDistanceToNow } from "date-fns";
 
 interface Reminder {
@@ -17,6 +18,21 @@ interface Reminder {
   created_at: string;
 }
 
+interface Page<T> {
+  status: string;
+  data: T[];
+  next_cursor: string | null;
+}
+
+const PAGE_SIZE = 50;
+
+const fetchPage = async <T,>(path: string, cursor: string | null): Promise<Page<T>> => {
+  const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${path}?${params}`);
+  return response.json();
+};
+
 interface Restriction {
   _id: string;
   type: string;
@@ -32,25 +48,29 @@ export default function HistoryPage() {
   const [isLoading, setIsLoading] = useState(true);
   const [activeTab, setActiveTab] = useState("all");
 
+  const [reminderCursor, setReminderCursor] = useState<string | null>(null);
+  const [restrictionCursor, setRestrictionCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
   useEffect(() => {
     const fetchData = async () => {
       try {
         setIsLoading(true);
         
-        // Fetch reminders
-        const remindersResponse = await fetch("/api/reminders");
-        const remindersData = await remindersResponse.json();
-        
-        // Fetch restrictions
-        const restrictionsResponse = await fetch("/api/restrictions");
-        const restrictionsData = await restrictionsResponse.json();
+        // Fetch the newest page of each
+        const [remindersData, restrictionsData] = await Promise.all([
+          fetchPage<Reminder>("/api/reminders", null),
+          fetchPage<Restriction>("/api/restrictions", null),
+        ]);
         
         if (remindersData.status === "success") {
           setReminders(remindersData.data);
+          setReminderCursor(remindersData.next_cursor);
         }
         
         if (restrictionsData.status === "success") {
           setRestrictions(restrictionsData.data);
+          setRestrictionCursor(restrictionsData.next_cursor);
         }
       } catch (error) {
         console.error("Error fetching data:", error);
@@ -62,6 +82,29 @@ export default function HistoryPage() {
     fetchData();
   }, []);
 
+  // Fetch the next page of whichever lists have more
+  const loadMore = async () => {
+    try {
+      setIsLoadingMore(true);
+      const [remindersData, restrictionsData] = await Promise.all([
+        reminderCursor ? fetchPage<Reminder>("/api/reminders", reminderCursor) : null,
+        restrictionCursor ? fetchPage<Restriction>("/api/restrictions", restrictionCursor) : null,
+      ]);
+      if (remindersData?.status === "success") {
+        setReminders((current) => [...current, ...remindersData.data]);
+        setReminderCursor(remindersData.next_cursor);
+      }
+      if (restrictionsData?.status === "success") {
+        setRestrictions((current) => [...current, ...restrictionsData.data]);
+        setRestrictionCursor(restrictionsData.next_cursor);
+      }
+    } catch (error) {
+      console.error("Error fetching more data:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   // Format the date for display
   const formatDate = (dateString: string) => {
     try {
@@ -300,6 +343,14 @@ export default function HistoryPage() {
           </TabsContent>
         </Tabs>
       </div>
+
+      {(reminderCursor || restrictionCursor) && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+            {isLoadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 } 
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator
+
+
+class LLMOverloadedError(Exception):
+    pass
+
+
+class LLMGateway:
+    """
+    Async front door to a Gemini GenerativeModel.
+
+    Calls use the native async API so generation never blocks the event
+    loop. At most max_concurrency run at once; up to max_queue more wait for
+    a slot and any beyond that are rejected. Each call has an overall
+    deadline, covering the wait, and prompt/output tokens from
+    usage_metadata are counted per call.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_concurrency: int = 4,
+        max_queue: int = 32,
+        timeout_sec: float = 60,
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout_sec = timeout_sec
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        # (time, prompt tokens, output tokens) of calls in the last minute
+        self._recent = deque()
+
+    async def stream(self, prompt, **kwargs) -> AsyncIterator:
+        """
+        Stream response chunks for prompt; kwargs go to generate_content_async.
+        The slot is held until the generator finishes or is closed, so a
+        caller that may stop early should wrap it in contextlib.aclosing.
+        """
+        deadline = time.monotonic() + self.timeout_sec
+        await self._acquire(deadline)
+        self.in_flight += 1
+        usage = None
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True, **kwargs),
+                self._remaining(deadline),
+            )
+            chunks = aiter(response)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        anext(chunks), self._remaining(deadline)
+                    )
+                except StopAsyncIteration:
+                    break
+                # Every chunk carries the running totals; the last one is final
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self._record(usage)
+
+    async def _acquire(self, deadline: float):
+        if not self._slots.locked():
+            # A free slot is taken without waiting
+            await self._slots.acquire()
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError("Too many LLM requests waiting")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self._remaining(deadline))
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM request deadline exceeded")
+        return remaining
+
+    def _record(self, usage):
+        self.calls += 1
+        prompt = getattr(usage, "prompt_token_count", 0) or 0
+        output = getattr(usage, "candidates_token_count", 0) or 0
+        self.prompt_tokens += prompt
+        self.output_tokens += output
+        now = time.monotonic()
+        self._recent.append((now, prompt, output))
+        while self._recent and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        recent = [r for r in self._recent if now - r[0] <= 60]
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "last_minute": {
+                "calls": len(recent),
+                "prompt_tokens": sum(r[1] for r in recent),
+                "output_tokens": sum(r[2] for r in recent),
+            },
+        }
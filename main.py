@@ -1,17 +1,36 @@
 import os
+import asyncio
 import datetime
-from contextlib import asynccontextmanager
+import hashlib
+from collections import defaultdict
+from contextlib import aclosing, asynccontextmanager
+from typing import Optional
 
-import requests
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
 from pymongo import MongoClient
+from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.mongodb import MongoDBJobStore
 import google.generativeai as genai
-from langchain_core.output_parsers import JsonOutputParser
 
+from compaction import TranscriptCompactor, estimate_tokens
+from deadlines import DeadlineSync
+from extraction import PROMPT_VERSION, RESPONSE_SCHEMA, ActionStreamParser, build_prompt
+from extraction_cache import ExtractionCache
+from llm import LLMGateway
+from rate_limit import CallLimiter
+from recurrence import occurrences, reminder_trigger
+from repository import ActionRepository
+from restrictions import RestrictionIndex, normalize_hostname
+from retell import RETELL_API_URL, RetellClient, RetellError
+from stale_cache import StaleWhileRevalidateCache
+from transcript_queue import TranscriptQueue
+from usage import UsageAggregator
+from usage_ingest import UsageIngestError, decode_body, is_iso_date, parse_batch
 
 load_dotenv()
 
@@ -25,37 +44,157 @@ RETELL_PHONE_NUMBER = os.getenv("RETELL_PHONE_NUMBER")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
 AGENT_NAME = os.getenv("AGENT_NAME", "")  # Default to empty string if not set
 FROM_NUMBER = os.getenv("FROM_NUMBER")
+RETELL_BASE_URL = os.getenv("RETELL_BASE_URL", RETELL_API_URL)
+RETELL_MAX_CONCURRENCY = int(os.getenv("RETELL_MAX_CONCURRENCY", "20"))
+RESTRICTION_REFRESH_SEC = int(os.getenv("RESTRICTION_REFRESH_SEC", "60"))
+# Reminders further out than this are left in MongoDB until the loader reaches them
+REMINDER_HORIZON_HOURS = int(os.getenv("REMINDER_HORIZON_HOURS", "24"))
+REMINDER_LOADER_MIN = int(os.getenv("REMINDER_LOADER_MIN", "60"))
+REMINDER_MISFIRE_GRACE_SEC = int(os.getenv("REMINDER_MISFIRE_GRACE_SEC", "600"))
+TRANSCRIPT_WORKERS = int(os.getenv("TRANSCRIPT_WORKERS", "2"))
+TRANSCRIPT_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPT_MAX_ATTEMPTS", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "60"))
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "1024"))
+EXTRACTION_CACHE_TTL_SEC = int(os.getenv("EXTRACTION_CACHE_TTL_SEC", "86400"))
+EXTRACTION_CACHE_MONGO = os.getenv("EXTRACTION_CACHE_MONGO", "").lower() in (
+    "1",
+    "true",
+)
+CALL_COOLDOWN_SEC = int(os.getenv("CALL_COOLDOWN_SEC", "1800"))
+CALL_BUCKET_CAPACITY = int(os.getenv("CALL_BUCKET_CAPACITY", "3"))
+CALL_REFILL_PER_HOUR = float(os.getenv("CALL_REFILL_PER_HOUR", "3"))
+CALL_LIMITER_SHARED = os.getenv("CALL_LIMITER_SHARED", "").lower() in ("1", "true")
+CANVAS_API_KEY = os.getenv("CANVAS_API_KEY")
+GRADES_TTL_SEC = int(os.getenv("GRADES_TTL_SEC", "600"))
+GRADES_REFRESH_MIN = int(os.getenv("GRADES_REFRESH_MIN", "15"))
+DEADLINE_SYNC_MIN = int(os.getenv("DEADLINE_SYNC_MIN", "60"))
+DEADLINE_LEAD_HOURS = float(os.getenv("DEADLINE_LEAD_HOURS", "12"))
 
 # MongoDB setup
-client = MongoClient(MONGO_URL)
-db = client.get_database("La-Hacks")
-action_collection = db.get_collection("action_restrictions")
-reminder_collection = db.get_collection("action_reminders")
+repository = ActionRepository(MONGO_URL)
+
+
+# Extracted actions by transcript hash, optionally backed by MongoDB
+extraction_cache = ExtractionCache(
+    max_entries=EXTRACTION_CACHE_SIZE,
+    ttl_sec=EXTRACTION_CACHE_TTL_SEC,
+    collection=(
+        repository.db.get_collection("extraction_cache")
+        if EXTRACTION_CACHE_MONGO
+        else None
+    ),
+)
 
+# Drops agent boilerplate from transcripts before they reach Gemini
+transcript_compactor = TranscriptCompactor()
 
-# Initialize scheduler for reminders
-scheduler = AsyncIOScheduler()
+# Pre-aggregated browser usage from the extension's reports
+usage_aggregator = UsageAggregator(repository.db)
+
+# Cooldown and per-phone rate limit for restriction notification calls
+call_limiter = CallLimiter(
+    cooldown_sec=CALL_COOLDOWN_SEC,
+    capacity=CALL_BUCKET_CAPACITY,
+    refill_per_hour=CALL_REFILL_PER_HOUR,
+    collection=(
+        repository.db.get_collection("call_cooldowns") if CALL_LIMITER_SHARED else None
+    ),
+)
+
+# In-memory restriction index, refreshed from MongoDB in the background
+restriction_index = RestrictionIndex()
+
+# Initialize scheduler for reminders. Reminder jobs persist in MongoDB so they
+# survive restarts; housekeeping jobs hold live objects and stay in memory.
+scheduler = AsyncIOScheduler(
+    jobstores={
+        "default": MongoDBJobStore(
+            database="La-Hacks",
+            collection="scheduler_jobs",
+            client=MongoClient(MONGO_URL),
+        ),
+        "memory": MemoryJobStore(),
+    }
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Setup RetellAI client
-    app.state.retell_headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {RETELL_API_KEY}",
-    }
+    app.state.retell = RetellClient(
+        RETELL_API_KEY,
+        RETELL_PHONE_NUMBER,
+        base_url=RETELL_BASE_URL,
+        max_concurrency=RETELL_MAX_CONCURRENCY,
+    )
 
     # Setup Gemini model
     genai.configure(api_key=GEMINI_API_KEY)
     app.state.gemini_model = genai.GenerativeModel(model_name="gemini-2.0-flash")
+    app.state.llm = LLMGateway(
+        app.state.gemini_model,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_queue=LLM_MAX_QUEUE,
+        timeout_sec=LLM_TIMEOUT_SEC,
+    )
+
+    await repository.create_indexes()
+    await extraction_cache.create_indexes()
+    await usage_aggregator.create_indexes()
+
+    # Load restrictions and keep them fresh for writes from other processes
+    await restriction_index.refresh(repository)
+    scheduler.add_job(
+        restriction_index.refresh,
+        trigger="interval",
+        seconds=RESTRICTION_REFRESH_SEC,
+        args=[repository],
+        id="restriction-index-refresh",
+        jobstore="memory",
+    )
+
+    # Only reminders inside the horizon become jobs; later ones load lazily
+    await load_due_reminders()
+    scheduler.add_job(
+        load_due_reminders,
+        trigger="interval",
+        minutes=REMINDER_LOADER_MIN,
+        id="reminder-loader",
+        jobstore="memory",
+    )
+
+    if CANVAS_API_KEY and FROM_NUMBER:
+        scheduler.add_job(
+            sync_canvas_deadlines,
+            trigger="interval",
+            minutes=DEADLINE_SYNC_MIN,
+            next_run_time=datetime.datetime.now(),
+            id="canvas-deadline-sync",
+            jobstore="memory",
+        )
 
     # Start scheduler
     scheduler.start()
 
+    # Drain queued webhook transcripts in the background
+    app.state.transcript_queue = TranscriptQueue(
+        repository.db.get_collection("transcript_jobs"),
+        process_transcript_job,
+        concurrency=TRANSCRIPT_WORKERS,
+        max_attempts=TRANSCRIPT_MAX_ATTEMPTS,
+    )
+    await app.state.transcript_queue.create_indexes()
+    app.state.transcript_queue.start()
+
     yield
 
     # Cleanup
+    await app.state.transcript_queue.stop()
     scheduler.shutdown()
+    await app.state.retell.close()
+    await repository.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -83,20 +222,13 @@ async def make_call(request: Request):
 
     print(f"Making call to {to_number}")
 
-    call_payload = {
-        "to_number": to_number,
-        "from_number": RETELL_PHONE_NUMBER,
-    }
-
-    response = requests.post(
-        "https://api.retellai.com/v2/create-phone-call",
-        headers=app.state.retell_headers,
-        json=call_payload,
-    )
+    try:
+        call = await app.state.retell.create_phone_call(to_number)
+    except RetellError as e:
+        print(f"Error making call to {to_number}: {e}")
+        return {"status": "error", "message": str(e)}
 
-    if response.status_code == 200:
-        call_id = response.json().get("call_id")
-        return {"status": "success", "call_id": call_id}
+    return {"status": "success", "call_id": call["call_id"]}
 
 
 class BrowserUsage(BaseModel):
@@ -108,142 +240,357 @@ class BrowserUsage(BaseModel):
 
 @app.post("/browser-usage")
 async def browser_usage(data: list[BrowserUsage]):
+    # Daily totals are keyed and range-queried on the client's ISO date
+    bad = next((usage.date for usage in data if not is_iso_date(usage.date)), None)
+    if bad is not None:
+        return JSONResponse(
+            {"status": "error", "message": f"date must be YYYY-MM-DD, got {bad!r}"},
+            status_code=400,
+        )
+
+    reports = defaultdict(dict)
     for usage in data:
-        res = await check_restriction(usage.hostname)
-        if res["restricted"]:
-            return {"notified": True, "hostname": usage.hostname}
+        reports[(usage.email, usage.date)][usage.hostname] = usage.active_sec
+
+    try:
+        await asyncio.gather(
+            *(
+                usage_aggregator.record_report(email, date, totals)
+                for (email, date), totals in reports.items()
+            )
+        )
+    except Exception as e:
+        print(f"Error aggregating browser usage: {e}")
+
+    match = restriction_index.first_match(usage.hostname for usage in data)
+    if match:
+        hostname, _ = match
+        await check_restriction(hostname)
+        return {"notified": True, "hostname": hostname}
 
     return {"notified": False}
 
 
-class TranscriptRequest(BaseModel):
-    transcript: str
+@app.post("/browser-usage/v2")
+async def browser_usage_v2(request: Request):
+    """
+    Ingest a compact usage report: per-client sequence number, header fields
+    once and only the hosts that changed, as seconds since the last report.
+    The body may be gzip-encoded JSON or msgpack.
+    """
+    try:
+        batch = parse_batch(
+            decode_body(
+                await request.body(),
+                request.headers.get("content-type", ""),
+                request.headers.get("content-encoding", ""),
+            )
+        )
+    except UsageIngestError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
 
+    try:
+        recorded = await usage_aggregator.record_batch(
+            batch.client_id, batch.seq, batch.email, batch.deltas, batch.date
+        )
+    except Exception as e:
+        print(f"Error aggregating browser usage: {e}")
+        # Not acknowledged, so the client keeps the report and re-sends it
+        return JSONResponse(
+            {"status": "error", "message": "Could not record usage report"},
+            status_code=503,
+        )
+    if not recorded:
+        return JSONResponse(
+            {"status": "error", "message": f"Sequence {batch.seq} already received"},
+            status_code=409,
+        )
 
-async def process_transcript(transcript: str, user_phone: str = None):
+    match = restriction_index.first_match(batch.deltas)
+    if match:
+        hostname, _ = match
+        await check_restriction(hostname)
+        return {"notified": True, "hostname": hostname, "seq": batch.seq}
+
+    return {"notified": False, "seq": batch.seq}
+
+
+@app.get("/api/usage")
+async def get_usage(
+    email: str,
+    period: str = "daily",
+    start: datetime.date = None,
+    end: datetime.date = None,
+):
     """
-    Process transcript using Gemini to determine intent and structure
+    Get daily or weekly browsing time per hostname from the usage rollups
     """
-    now = datetime.datetime.now().isoformat()
-    prompt = f"""
-Analyze the following transcript from a phone call and determine if it's for:
-1. Setting a restriction on a website
-2. Setting a reminder for a task
+    if period not in ("daily", "weekly"):
+        return {"status": "error", "message": "period must be daily or weekly"}
+
+    end = end or datetime.date.today()
+    start = start or end - datetime.timedelta(days=6 if period == "daily" else 27)
+    try:
+        data = await usage_aggregator.rollup(email, period, start, end)
+        return {"status": "success", "data": data}
+    except Exception as e:
+        print(f"Error fetching usage: {e}")
+        return {"status": "error", "message": str(e)}
 
-THERE ARE CAN BE MULTIPLE RESTRICTIONS AND REMINDERS IN THE TRANSCRIPT. PLEASE REVIEW AND RETURN ALL OF THEM.
-UNDERSTAND what user wants, identify all reminders and it can have multiple times. identify all restrictions and it can have multiple hostnames.
-we need json for each restriction and reminder. If there is a daily event, create multiple reminders for each day.
 
-If it's a restriction, extract:
-- hostname (the website to restrict)
-- description (reason for restriction)
-- phone number
+class TranscriptRequest(BaseModel):
+    transcript: str
 
-If it's a reminder, extract:
-- date (in YYYY-MM-DD format, use today's date if not specified)
-- time (in HH:MM format)
-- description (what to remind about)
-- phone number
 
-RESPOND ONLY WITH A VALID JSON OBJECT. Do not include any explanations, markdown formatting, or code blocks.
-The JSON must have a "type" field that is either "restriction" or "reminder", plus the other extracted fields.
+async def extract_actions(transcript: str, user_phone: str = None):
+    """
+    Stream the restrictions and reminders Gemini finds in a transcript, one
+    validated item at a time, reusing a cached extraction for a transcript
+    already seen today
+    """
+    today = datetime.date.today()
+    cache_key = extraction_cache.key(transcript, user_phone, PROMPT_VERSION, today)
+    cached = await extraction_cache.get(cache_key)
+    if cached is not None:
+        for item in cached:
+            yield item
+        return
+
+    compacted = transcript_compactor.compact(transcript)
+    print(
+        f"Compacted transcript from ~{estimate_tokens(transcript)} to "
+        f"~{estimate_tokens(compacted)} tokens"
+    )
 
-The user's phone number is {user_phone}. Today's date is {now}.
-Example response for a reminder:
-{{"type": "reminder", "date": "2023-04-15", "time": "07:00", "description": "Wake up call", "phone": "+1234567890"}}
+    now = datetime.datetime.now().isoformat()
+    response = app.state.llm.stream(
+        build_prompt(compacted, user_phone, now),
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA,
+        ),
+    )
 
-Example response for a restriction:
-{{"type": "restriction", "hostname": "www.facebook.com", "description": "Avoid social media", "phone": "+1234567890"}}
+    parser = ActionStreamParser()
+    result = []
+    # Closed even if our consumer stops early, so the LLM slot is released
+    async with aclosing(response):
+        async for chunk in response:
+            if not chunk.parts:
+                continue
+            for item in parser.feed(chunk.text):
+                result.append(item)
+                yield dict(item)
 
-Transcript: {transcript}
-"""
+    if parser.invalid:
+        print(f"Dropped {parser.invalid} invalid items from Gemini response")
 
-    try:
-        response = app.state.gemini_model.generate_content(prompt)
-        response_text = response.text
-        parser = JsonOutputParser()
-        result = parser.parse(response_text)
+    # Only complete responses are cached
+    await extraction_cache.set(cache_key, result)
 
-        assert isinstance(result, list), "Response should be a list of JSON objects"
 
-        for item in result:
+async def process_transcript(transcript: str, user_phone: str = None):
+    """
+    Process transcript using Gemini to determine intent and structure.
+    Reminders are scheduled as soon as they are parsed; rows are written once
+    the whole response is in. Errors propagate so the transcript queue can
+    retry the job.
+    """
+    now = datetime.datetime.now().isoformat()
+    horizon = datetime.datetime.now() + datetime.timedelta(hours=REMINDER_HORIZON_HOURS)
+
+    restrictions = []
+    reminders = []
+    async with aclosing(extract_actions(transcript, user_phone)) as items:
+        async for item in items:
             # Add current date and timestamp
             item["created_at"] = now
+            item["phone"] = item.get("phone") or user_phone
 
             if item["type"] == "restriction":
-                # Store restriction in database
-                action_collection.insert_one(item)
-                print(f"Stored new restriction: {item}")
-
-            elif item["type"] == "reminder":
-                # Store reminder in database
-                reminder_collection.insert_one(item).inserted_id
-
-                # Schedule reminder if time is specified
-                if item.get("time") and item.get("phone"):
-                    schedule_reminder(
-                        item["date"],
-                        item["time"],
-                        item["phone"],
-                        item["description"],
-                    )
-                    print(f"Scheduled reminder: {item}")
+                restrictions.append(item)
+                continue
+
+            item["run_at"] = reminder_run_at(item)
+            reminders.append(item)
+
+            # Schedule reminder if time is specified and it falls in the horizon.
+            # Recurring reminders are a single cron job, so they always go in.
+            if (
+                item["run_at"]
+                and item.get("phone")
+                and (item.get("days") or item["run_at"] < horizon)
+            ):
+                schedule_reminder(
+                    item["date"],
+                    item["time"],
+                    item["phone"],
+                    item["description"],
+                    item.get("days"),
+                )
+                print(f"Scheduled reminder: {item}")
 
-    except Exception as e:
-        print(f"Error prompting Gemini: {e}")
-        result = []
+    # One round-trip per collection, upserted so retries don't duplicate
+    new_restrictions, new_reminders = await asyncio.gather(
+        repository.save_restrictions(restrictions),
+        repository.save_reminders(reminders),
+    )
+    print(
+        f"Stored {new_restrictions} new restrictions and "
+        f"{new_reminders} new reminders"
+    )
+
+    for item in restrictions:
+        restriction_index.add(item)
 
-    return str(result)
+    return str(restrictions + reminders)
 
 
-def schedule_reminder(date_str: str, time_str: str, phone: str, description: str):
+def reminder_run_at(item: dict):
     """
-    Schedule a reminder call
+    Parse a reminder's date and time, or None if it has no usable time
     """
     try:
-        # Parse date and time
-        reminder_datetime = datetime.datetime.strptime(
-            f"{date_str} {time_str}", "%Y-%m-%d %H:%M"
+        return datetime.datetime.strptime(
+            f"{item['date']} {item['time']}", "%Y-%m-%d %H:%M"
         )
-
-        # Add job to scheduler
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def schedule_reminder(
+    date_str: str,
+    time_str: str,
+    phone: str,
+    description: str,
+    days: str = None,
+    job_id: str = None,
+):
+    """
+    Schedule a reminder call, as a cron job if it repeats on days
+    """
+    try:
+        trigger = reminder_trigger({"date": date_str, "time": time_str, "days": days})
+
+        # Add job to scheduler. The id follows the reminder's upsert key, so
+        # loading the same reminder twice replaces the job instead of doubling it.
+        if job_id is None:
+            job_id = f"reminder:{phone}:{date_str}:{time_str}"
+            if days:
+                job_id += f":{days}"
         scheduler.add_job(
             make_reminder_call,
-            trigger="date",
-            run_date=reminder_datetime,
+            trigger=trigger,
             args=[phone, description],
+            id=job_id,
+            replace_existing=True,
+            misfire_grace_time=REMINDER_MISFIRE_GRACE_SEC,
         )
     except Exception as e:
         print(f"Error scheduling reminder: {e}")
 
 
+def deadline_job_id(item: dict):
+    """
+    Canvas deadline reminders keep one job per assignment, so a moved due
+    date replaces the old job
+    """
+    if item.get("deadline"):
+        return f"deadline:{item['deadline']}"
+    return None
+
+
+def schedule_deadline_reminder(item: dict):
+    """
+    Replace the call for a new or moved deadline. Reminders past the horizon
+    lose any job for the old date and are scheduled later by the loader.
+    """
+    horizon = datetime.datetime.now() + datetime.timedelta(hours=REMINDER_HORIZON_HOURS)
+    if item["run_at"] < horizon:
+        schedule_reminder(
+            item["date"],
+            item["time"],
+            item["phone"],
+            item["description"],
+            job_id=deadline_job_id(item),
+        )
+    else:
+        cancel_deadline_reminder(item["deadline"])
+
+
+def cancel_deadline_reminder(deadline: str):
+    job_id = deadline_job_id({"deadline": deadline})
+    try:
+        if scheduler.get_job(job_id) is not None:
+            scheduler.remove_job(job_id)
+    except Exception as e:
+        print(f"Error cancelling reminder {job_id}: {e}")
+
+
+# Reminder calls ahead of Canvas due dates, keyed by course and assignment
+deadline_sync = DeadlineSync(
+    repository,
+    schedule_deadline_reminder,
+    cancel_deadline_reminder,
+    phone=FROM_NUMBER,
+    lead_hours=DEADLINE_LEAD_HOURS,
+)
+
+
+async def sync_canvas_deadlines():
+    """
+    Turn new or moved Canvas due dates into reminder calls
+    """
+    # Imported lazily so the Canvas module costs nothing when sync is off
+    from tools import canvas
+
+    try:
+        deadlines = await canvas.fetch_upcoming_deadlines()
+        changed = await deadline_sync.sync(deadlines)
+    except Exception as e:
+        print(f"Error syncing Canvas deadlines: {e}")
+        return
+    print(f"Synced {len(deadlines)} Canvas deadlines, {changed} changed")
+
+
+async def load_due_reminders():
+    """
+    Schedule reminders due before the end of the horizon window
+    """
+    now = datetime.datetime.now()
+    end = now + datetime.timedelta(hours=REMINDER_HORIZON_HOURS)
+    try:
+        reminders = await repository.reminders_due(now, end)
+    except Exception as e:
+        print(f"Error loading due reminders: {e}")
+        return
+
+    for item in reminders:
+        if item.get("phone"):
+            schedule_reminder(
+                item["date"],
+                item["time"],
+                item["phone"],
+                item["description"],
+                item.get("days"),
+                deadline_job_id(item),
+            )
+    print(f"Loaded {len(reminders)} reminders due before {end.isoformat()}")
+
+
 async def make_reminder_call(phone: str, description: str):
     """
     Make a call to remind the user
     """
     try:
-        # Request body for RetellAI call API
-        call_payload = {
-            "to_number": phone,
-            "from_number": RETELL_PHONE_NUMBER,
-            "override_agent_id": AGENT_ID_REMINDER,
-            "retell_llm_dynamic_variables": {"reminder_description": description},
-        }
-
-        # Make API call to RetellAI
-        response = requests.post(
-            "https://api.retellai.com/v2/create-phone-call",
-            headers=app.state.retell_headers,
-            json=call_payload,
+        call = await app.state.retell.create_phone_call(
+            phone,
+            agent_id=AGENT_ID_REMINDER,
+            dynamic_variables={"reminder_description": description},
+        )
+        print(
+            f"Reminder call initiated successfully: {call['call_id']} for {description}"
         )
-
-        # The response is successful if we get a call_id back
-        if "call_id" in response.json():
-            print(
-                f"Reminder call initiated successfully: {response.json()['call_id']} for {description}"
-            )
-        else:
-            print(f"Error making reminder call: {response.text}")
 
     except Exception as e:
         print(f"Error in make_reminder_call: {e}")
@@ -255,7 +602,7 @@ async def check_restriction(hostname: str, make_call: bool = True):
     Check if a website is restricted for Chrome extension
     """
     print(f"Checking restriction for {hostname}")
-    restriction = action_collection.find_one({"hostname": hostname})
+    restriction = restriction_index.match(hostname)
 
     if not restriction:
         return {"restricted": False}
@@ -263,29 +610,24 @@ async def check_restriction(hostname: str, make_call: bool = True):
     print(f"Restriction found: {restriction}")
 
     if make_call and restriction.get("phone"):
+        # Key on the restricted hostname so every subdomain shares one cooldown
+        if not await call_limiter.acquire(
+            restriction["phone"], normalize_hostname(restriction["hostname"])
+        ):
+            print(f"Restriction notification call suppressed for {hostname}")
+            return {"restricted": True, "description": restriction.get("description")}
+
         try:
-            # Make call using RetellAI
-            call_payload = {
-                "to_number": restriction["phone"],
-                "from_number": RETELL_PHONE_NUMBER,
-                "override_agent_id": AGENT_ID_RESTRICTION,
-                "retell_llm_dynamic_variables": {
+            call = await app.state.retell.create_phone_call(
+                restriction["phone"],
+                agent_id=AGENT_ID_RESTRICTION,
+                dynamic_variables={
                     "restriction_description": restriction.get("hostname")
                 },
-            }
-
-            response = requests.post(
-                "https://api.retellai.com/v2/create-phone-call",
-                headers=app.state.retell_headers,
-                json=call_payload,
             )
-
-            if "call_id" in response.json():
-                print(
-                    f"Restriction notification call initiated successfully: {response.json()['call_id']}"
-                )
-            else:
-                print(f"Error making restriction notification call: {response.text}")
+            print(
+                f"Restriction notification call initiated successfully: {call['call_id']}"
+            )
 
         except Exception as e:
             print(f"Error making restriction notification call: {e}")
@@ -293,32 +635,137 @@ async def check_restriction(hostname: str, make_call: bool = True):
     return {"restricted": True, "description": restriction.get("description")}
 
 
+def page_filters(
+    phone: str = None,
+    type: str = None,
+    created_from: datetime.date = None,
+    created_to: datetime.date = None,
+    cursor: str = None,
+    limit: int = 50,
+    fields: str = None,
+) -> dict:
+    """
+    Query parameters shared by the paginated listings. fields is a
+    comma-separated projection, e.g. "hostname,created_at".
+    """
+    return {
+        "phone": phone,
+        "type": type,
+        "created_from": created_from,
+        "created_to": created_to,
+        "cursor": cursor,
+        "limit": limit,
+        "fields": (
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        ),
+    }
+
+
 @app.get("/api/restrictions")
-async def get_restrictions():
+async def get_restrictions(page: dict = Depends(page_filters)):
     """
-    Get all website restrictions
+    Get website restrictions, newest first, one page at a time; pass
+    next_cursor back as cursor for the next page
     """
     try:
-        restrictions = list(action_collection.find({}, {"_id": 0}))
-        return {"status": "success", "data": restrictions}
+        restrictions, next_cursor = await repository.page_restrictions(**page)
+        return {"status": "success", "data": restrictions, "next_cursor": next_cursor}
     except Exception as e:
         print(f"Error fetching restrictions: {e}")
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/api/restrictions/snapshot")
+async def get_restriction_snapshot(request: Request):
+    """
+    Restricted hostnames for the extension to match locally, or 304 when the
+    client's copy (If-None-Match) is current
+    """
+    snapshot = restriction_index.snapshot()
+    headers = {"ETag": snapshot["etag"], "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if snapshot["etag"] in client_etags:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(snapshot, headers=headers)
+
+
 @app.get("/api/reminders")
-async def get_reminders():
+async def get_reminders(
+    start: datetime.date = None,
+    end: datetime.date = None,
+    page: dict = Depends(page_filters),
+):
     """
-    Get all reminders
+    Get reminders newest first, one page at a time, or those firing between
+    start and end with their occurrences expanded
     """
     try:
-        reminders = list(reminder_collection.find({}, {"_id": 0}))
+        if start is None or end is None:
+            reminders, next_cursor = await repository.page_reminders(**page)
+            return {"status": "success", "data": reminders, "next_cursor": next_cursor}
+
+        reminders = []
+        for item in await repository.reminders_between(start, end):
+            try:
+                fire_times = occurrences(item, start, end)
+            except Exception as e:
+                # One bad stored row must not fail the whole range
+                print(f"Skipping reminder {item.get('description')!r}: {e}")
+                continue
+            if fire_times:
+                item["occurrences"] = [t.isoformat() for t in fire_times]
+                reminders.append(item)
         return {"status": "success", "data": reminders}
     except Exception as e:
         print(f"Error fetching reminders: {e}")
         return {"status": "error", "message": str(e)}
 
 
+async def load_grades():
+    # Imported lazily so the Canvas module costs nothing until grades are requested
+    from tools import canvas
+
+    return await canvas.fetch_grade_summaries()
+
+
+# Canvas grade summaries, served stale while a refresh runs in the background
+grades_cache = StaleWhileRevalidateCache(load_grades, ttl_sec=GRADES_TTL_SEC)
+
+
+@app.get("/api/grades")
+async def get_grades():
+    """
+    Get per-course grade summaries from Canvas without waiting on Canvas
+    """
+    # Keep grades warm once the dashboard has asked for them
+    if scheduler.get_job("grades-refresh") is None:
+        scheduler.add_job(
+            grades_cache.refresh,
+            trigger="interval",
+            minutes=GRADES_REFRESH_MIN,
+            id="grades-refresh",
+            jobstore="memory",
+        )
+
+    data = grades_cache.get()
+    if data is None:
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "pending",
+                "message": grades_cache.last_error or "Fetching grades from Canvas",
+            },
+        )
+
+    return {
+        "status": "success",
+        "data": data,
+        "updated_at": grades_cache.updated_at.isoformat(),
+        "stale": grades_cache.stale,
+    }
+
+
 @app.post("/action/process-example")
 async def process_example():
     """
@@ -356,49 +803,109 @@ User: No. I think that's it.
 Agent: Wonderful! I'm excited to help you stay on track. I'll go ahead and wrap things up. Have a productive day, and I'll talk to you tomorrow!
     """
 
-    await process_transcript(transcript)
+    try:
+        return await process_transcript(transcript)
+    except Exception as e:
+        print(f"Error prompting Gemini: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+# Kinds of webhook job handled by the transcript queue workers
+TRANSCRIPT_JOB = "transcript"
+VOICEMAIL_JOB = "voicemail"
+
+
+class RetellCall(BaseModel):
+    call_id: Optional[str] = None
+    from_number: Optional[str] = None
+    transcript: Optional[str] = None
+
+
+class RetellWebhook(BaseModel):
+    event: str
+    call: RetellCall
+    call_id: Optional[str] = None
 
 
 # Webhook route to receive call completion notifications
 @app.post("/webhook")
 async def webhook(request: Request):
-    data = await request.json()
+    try:
+        data = RetellWebhook.model_validate(await request.json())
+    except (ValueError, ValidationError) as e:
+        return JSONResponse(
+            {"status": "error", "message": f"Invalid webhook payload: {e}"},
+            status_code=400,
+        )
+
+    if data.call.from_number:
+        print(f"Call completed for {data.call.from_number}")
 
-    if "from_number" in data["call"]:
-        print(f"Call completed for {data['call']['from_number']}")
+    if data.event != "call_analyzed":
+        return {"status": "skipped"}
 
-    if data["event"] != "call_analyzed":
+    transcript = data.call.transcript
+    if not transcript:
         return {"status": "skipped"}
 
-    call_id = data.get("call_id")
+    call_id = data.call.call_id or data.call_id
+    if not call_id:
+        # Fall back to the transcript itself so retries still dedupe
+        call_id = hashlib.sha256(transcript.encode()).hexdigest()
     print(f"Call analyzed notification received for call ID: {call_id}")
-    transcript = data["call"]["transcript"]
     # user_phone = data["call"]["from_number"]
     print(f"Transcript: {transcript}")
 
+    # Both paths run on the queue workers, keyed on call_id, so Retell gets an
+    # answer right away and a redelivery is ignored
+    kind = TRANSCRIPT_JOB
     if "voicemail" in transcript.lower() or "voice mail" in transcript.lower():
-        description = (
-            "checking in with their accountability buddy who did not respond to"
-            "their reminder call."
-        )
-        call_payload = {
-            "to_number": FROM_NUMBER,
-            "from_number": RETELL_PHONE_NUMBER,
-            "override_agent_id": AGENT_ID_REMINDER,
-            "retell_llm_dynamic_variables": {"reminder_description": description},
-        }
-        response = requests.post(
-            "https://api.retellai.com/v2/create-phone-call",
-            headers=app.state.retell_headers,
-            json=call_payload,
-        )
-        if response.status_code == 200:
-            print(f"Voicemail detected, call made to {FROM_NUMBER}")
-        else:
-            print(f"Error making call to {FROM_NUMBER}: {response.text}")
-        return {"status": "skipped"}
+        kind = VOICEMAIL_JOB
+    queued = await app.state.transcript_queue.enqueue(
+        call_id, transcript, FROM_NUMBER, kind=kind
+    )
+    return JSONResponse(
+        status_code=202,
+        content={"status": "queued" if queued else "duplicate", "call_id": call_id},
+    )
+
+
+async def process_transcript_job(job: dict):
+    if job.get("kind") == VOICEMAIL_JOB:
+        await call_back_after_voicemail(job.get("phone"))
+        return
+    await process_transcript(job["transcript"], job.get("phone"))
 
-    await process_transcript(transcript, FROM_NUMBER)
+
+async def call_back_after_voicemail(phone: str):
+    """
+    Call the user back when the reminder call reached their voicemail. A
+    RetellError fails the job so the queue retries it with backoff.
+    """
+    description = (
+        "checking in with their accountability buddy who did not respond to"
+        "their reminder call."
+    )
+    await app.state.retell.create_phone_call(
+        phone,
+        agent_id=AGENT_ID_REMINDER,
+        dynamic_variables={"reminder_description": description},
+    )
+    print(f"Voicemail detected, call made to {phone}")
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Operational counters for the background workers and caches
+    """
+    return {
+        "transcript_queue": await app.state.transcript_queue.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "transcript_compaction": transcript_compactor.stats(),
+        "restriction_calls": call_limiter.stats(),
+        "llm": app.state.llm.stats(),
+    }
 
 
 if __name__ == "__main__":
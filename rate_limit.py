@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+
+from pymongo.errors import DuplicateKeyError
+
+
+class CallLimiter:
+    """
+    Decides whether a restriction notification call may be placed.
+
+    Each (phone, hostname) pair gets a cooldown, and each phone a token bucket
+    capping how many calls it receives per hour across all hostnames. Both are
+    held in memory. When a MongoDB collection is given, the cooldown is also
+    claimed there atomically so several workers don't call the same person
+    about the same site. Suppressed triggers are counted by reason.
+    """
+
+    def __init__(
+        self,
+        cooldown_sec: float = 1800,
+        capacity: float = 3,
+        refill_per_hour: float = 3,
+        collection=None,
+        max_keys: int = 10000,
+    ):
+        self.cooldown_sec = cooldown_sec
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_hour / 3600
+        self.collection = collection
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.suppressed = Counter()
+        self._last_call: dict[tuple[str, str], float] = {}
+        # phone -> (tokens, last refill time)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    async def acquire(self, phone: str, hostname: str) -> bool:
+        now = time.time()
+        key = (phone, hostname)
+
+        last = self._last_call.get(key)
+        if last is not None and now - last < self.cooldown_sec:
+            self.suppressed["cooldown"] += 1
+            return False
+
+        tokens = self._tokens(phone, now)
+        if tokens < 1:
+            self.suppressed["rate_limit"] += 1
+            return False
+
+        # Take the token and the cooldown before awaiting, so concurrent
+        # acquires for the same phone see them
+        self._buckets[phone] = (tokens - 1, now)
+        self._last_call[key] = now
+        if self.collection is not None:
+            try:
+                claimed = await self._claim_shared(key, now)
+            except Exception:
+                self._refund(phone)
+                if last is None:
+                    self._last_call.pop(key, None)
+                else:
+                    self._last_call[key] = last
+                raise
+            if not claimed:
+                self._refund(phone)
+                self.suppressed["shared_cooldown"] += 1
+                return False
+
+        self._prune(now)
+        self.allowed += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "suppressed": dict(self.suppressed),
+            "tracked_keys": len(self._last_call),
+        }
+
+    def _tokens(self, phone: str, now: float) -> float:
+        tokens, updated = self._buckets.get(phone, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.refill_per_sec)
+
+    def _refund(self, phone: str):
+        bucket = self._buckets.get(phone)
+        if bucket is not None:
+            tokens, updated = bucket
+            self._buckets[phone] = (min(self.capacity, tokens + 1), updated)
+
+    async def _claim_shared(self, key: tuple[str, str], now: float) -> bool:
+        # Matches only if the stored cooldown has expired; otherwise the upsert
+        # collides with the existing document
+        try:
+            await self.collection.update_one(
+                {"_id": "|".join(key), "last_call": {"$lt": now - self.cooldown_sec}},
+                {"$set": {"last_call": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def _prune(self, now: float):
+        if len(self._last_call) <= self.max_keys:
+            return
+        self._last_call = {
+            key: last
+            for key, last in self._last_call.items()
+            if now - last < self.cooldown_sec
+        }
+        self._buckets = {
+            phone: bucket
+            for phone, bucket in self._buckets.items()
+            if self._tokens(phone, now) < self.capacity
+        }
@@ -0,0 +1,49 @@
+import datetime
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from tzlocal import get_localzone
+
+
+def reminder_trigger(item: dict):
+    """
+    Build the scheduler trigger for a reminder.
+
+    One-off reminders fire once at their date and time. Recurring reminders
+    carry a cron day-of-week expression in "days" ("*", "mon-fri", "fri") and
+    fire at their time on matching days, starting from their date.
+    """
+    hour, minute = (int(part) for part in item["time"].split(":"))
+    start = datetime.datetime.strptime(item["date"], "%Y-%m-%d")
+
+    if item.get("days"):
+        return CronTrigger(
+            day_of_week=item["days"],
+            hour=hour,
+            minute=minute,
+            start_date=start,
+            timezone=get_localzone(),
+        )
+    return DateTrigger(
+        run_date=start.replace(hour=hour, minute=minute), timezone=get_localzone()
+    )
+
+
+def occurrences(
+    item: dict, start: datetime.date, end: datetime.date, limit: int = 366
+) -> list[datetime.datetime]:
+    """
+    Expand a reminder into the times it fires between start and end, inclusive
+    """
+    trigger = reminder_trigger(item)
+    tz = get_localzone()
+    now = datetime.datetime.combine(start, datetime.time.min, tzinfo=tz)
+    until = datetime.datetime.combine(end, datetime.time.max, tzinfo=tz)
+
+    result = []
+    fire_time = trigger.get_next_fire_time(None, now)
+    while fire_time is not None and fire_time <= until and len(result) < limit:
+        if fire_time >= now:
+            result.append(fire_time)
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+    return result
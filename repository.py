@@ -0,0 +1,234 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, UpdateOne
+
+# Fields identifying the same action when a transcript is processed again
+RESTRICTION_KEY = ("phone", "type", "hostname")
+REMINDER_KEY = ("phone", "type", "date", "time", "days")
+
+# Listing order: newest first, _id breaking ties between rows of one transcript
+PAGE_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+MAX_PAGE_SIZE = 500
+
+
+class ActionRepository:
+    """
+    Async access to the restriction and reminder collections
+    """
+
+    def __init__(self, mongo_url: str, db_name: str = "La-Hacks"):
+        self.client = AsyncMongoClient(mongo_url)
+        self.db = self.client.get_database(db_name)
+        self.restrictions = self.db.get_collection("action_restrictions")
+        self.reminders = self.db.get_collection("action_reminders")
+
+    async def create_indexes(self):
+        # Not unique: older deployments may already hold duplicate rows
+        await self.restrictions.create_index(
+            [(field, ASCENDING) for field in RESTRICTION_KEY]
+        )
+        await self.reminders.create_index(
+            [(field, ASCENDING) for field in REMINDER_KEY]
+        )
+        await self.reminders.create_index("run_at")
+        await self.reminders.create_index("date")
+        await self.reminders.create_index("deadline", sparse=True)
+        # Keyset pagination, overall and per phone
+        for collection in (self.restrictions, self.reminders):
+            await collection.create_index(PAGE_SORT)
+            await collection.create_index([("phone", ASCENDING), *PAGE_SORT])
+
+    async def close(self):
+        await self.client.close()
+
+    async def save_restrictions(self, items: list[dict]) -> int:
+        """
+        Upsert restrictions in one round-trip, returning how many were new
+        """
+        return await _upsert_many(self.restrictions, items, RESTRICTION_KEY)
+
+    async def save_reminders(self, items: list[dict]) -> int:
+        """
+        Upsert reminders in one round-trip, returning how many were new
+        """
+        return await _upsert_many(self.reminders, items, REMINDER_KEY)
+
+    async def save_deadline_reminders(self, items: list[dict]):
+        """
+        Upsert reminders generated from Canvas due dates, one per assignment
+        """
+        if not items:
+            return
+        await self.reminders.bulk_write(
+            [
+                UpdateOne({"deadline": item["deadline"]}, {"$set": item}, upsert=True)
+                for item in items
+            ],
+            ordered=False,
+        )
+
+    async def delete_deadline_reminders(self, keys: list[str]):
+        """
+        Delete the reminders generated for these Canvas assignment keys
+        """
+        await self.reminders.delete_many({"deadline": {"$in": keys}})
+
+    async def deadline_due_dates(self) -> dict[str, str]:
+        """
+        Map each Canvas assignment key to the due date its reminder was built from
+        """
+        docs = await self.reminders.find(
+            {"deadline": {"$exists": True}}, {"_id": 0, "deadline": 1, "due_at": 1}
+        ).to_list()
+        return {doc["deadline"]: doc.get("due_at") for doc in docs}
+
+    async def reminders_due(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> list[dict]:
+        """
+        Reminders whose run_at falls in [start, end), served from the run_at index
+        """
+        return await self.reminders.find(
+            {"run_at": {"$gte": start, "$lt": end}}, {"_id": 0}
+        ).to_list()
+
+    async def reminders_between(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[dict]:
+        """
+        One-off reminders dated in [start, end] and recurring ones started by end
+        """
+        return await self.reminders.find(
+            {
+                "$or": [
+                    {"date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+                    {"days": {"$nin": [None, ""]}, "date": {"$lte": end.isoformat()}},
+                ]
+            },
+            {"_id": 0},
+        ).to_list()
+
+    async def page_restrictions(self, **kwargs) -> tuple[list[dict], Optional[str]]:
+        """
+        One page of restrictions, newest first; see _page for the arguments
+        """
+        return await _page(self.restrictions, **kwargs)
+
+    async def page_reminders(self, **kwargs) -> tuple[list[dict], Optional[str]]:
+        """
+        One page of reminders, newest first; see _page for the arguments
+        """
+        return await _page(self.reminders, **kwargs)
+
+    async def list_restrictions(self) -> list[dict]:
+        return await self.restrictions.find({}, {"_id": 0}).to_list()
+
+
+def encode_cursor(doc: dict) -> str:
+    payload = json.dumps([doc.get("created_at"), str(doc["_id"])])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[str], ObjectId]:
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return created_at, ObjectId(doc_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+
+def _after(cursor: str) -> dict:
+    """
+    Rows after the cursor in PAGE_SORT order. Rows without created_at sort
+    last, as null is below every string.
+    """
+    created_at, doc_id = decode_cursor(cursor)
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": doc_id}}
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+            {"created_at": None},
+        ]
+    }
+
+
+async def _page(
+    collection,
+    phone: Optional[str] = None,
+    type: Optional[str] = None,
+    created_from: Optional[datetime.date] = None,
+    created_to: Optional[datetime.date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[list[str]] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Keyset pagination on (created_at, _id): each page is one index range
+    scan of `limit` rows, however deep it is. Returns the rows, projected to
+    `fields` when given, and the cursor of the next page or None.
+    """
+    query = {}
+    if phone:
+        query["phone"] = phone
+    if type:
+        query["type"] = type
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from.isoformat()
+        if created_to:
+            next_day = created_to + datetime.timedelta(days=1)
+            query["created_at"]["$lt"] = next_day.isoformat()
+    if cursor:
+        query = {"$and": [query, _after(cursor)]} if query else _after(cursor)
+
+    projection = None
+    if fields:
+        projection = {field: 1 for field in fields}
+        projection["created_at"] = 1
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # One extra row tells whether another page follows
+    docs = await (
+        collection.find(query, projection).sort(PAGE_SORT).limit(limit + 1).to_list()
+    )
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    docs = docs[:limit]
+    for doc in docs:
+        del doc["_id"]
+        if fields and "created_at" not in fields:
+            doc.pop("created_at", None)
+    return docs, next_cursor
+
+
+async def _upsert_many(collection, items: Iterable[dict], key: tuple) -> int:
+    operations = []
+    for item in items:
+        keys = {k: item.get(k) for k in key}
+        fields = {k: v for k, v in item.items() if k not in key and k != "_id"}
+        # Keep the original creation time when the same action comes back.
+        # The key fields always go in $setOnInsert so the update is never
+        # empty, which UpdateOne rejects, even for an item with only keys.
+        created_at = fields.pop("created_at", None)
+        on_insert = dict(keys)
+        if created_at is not None:
+            on_insert["created_at"] = created_at
+        update = {"$setOnInsert": on_insert}
+        if fields:
+            update["$set"] = fields
+        operations.append(UpdateOne(keys, update, upsert=True))
+
+    if not operations:
+        return 0
+
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.upserted_count
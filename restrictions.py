@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import math
+from typing import Iterable, Optional
+
+# Above this many hostnames a snapshot carries a Bloom filter instead of the list
+BLOOM_THRESHOLD = 1000
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+# FNV-1a seeds for the two base hashes of double hashing
+BLOOM_SEEDS = (0x811C9DC5, 0x9747B28C)
+
+
+def normalize_hostname(hostname: str) -> str:
+    """
+    Lowercase a hostname and strip the port, trailing dot and leading "www."
+    """
+    hostname = hostname.strip().lower().split(":", 1)[0].rstrip(".")
+    if hostname.startswith("www."):
+        hostname = hostname[len("www.") :]
+    return hostname
+
+
+def fnv1a(text: str, seed: int) -> int:
+    """32-bit FNV-1a, matching the extension's implementation"""
+    h = seed
+    for byte in text.encode():
+        h = ((h ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def bloom_filter(
+    hostnames: list[str], false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE
+) -> dict:
+    """
+    Build a Bloom filter over hostnames. Bit i of the base64 "bits" is
+    byte i >> 3, mask 1 << (i & 7); probe j of a key is (h1 + j * h2) % m.
+    """
+    n = max(len(hostnames), 1)
+    m = math.ceil(-n * math.log(false_positive_rate) / math.log(2) ** 2)
+    m += -m % 8
+    k = max(1, round(m / n * math.log(2)))
+
+    bits = bytearray(m // 8)
+    for hostname in hostnames:
+        h1, h2 = (fnv1a(hostname, seed) for seed in BLOOM_SEEDS)
+        for j in range(k):
+            i = (h1 + j * h2) % m
+            bits[i >> 3] |= 1 << (i & 7)
+    return {"m": m, "k": k, "bits": base64.b64encode(bits).decode()}
+
+
+class RestrictionIndex:
+    """
+    In-memory hostname index over the restriction collection.
+
+    Restrictions are keyed by normalized hostname. A lookup walks the labels of
+    the requested hostname from most to least specific ("m.facebook.com", then
+    "facebook.com"), so a restriction on "www.facebook.com" also covers every
+    subdomain of "facebook.com" without touching the database.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {}
+        self.version = 0
+        self._snapshot: Optional[tuple[tuple[int, int], dict]] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, restrictions: Iterable[dict]):
+        """
+        Replace the index contents, bumping the version only if they changed
+        """
+        entries = {}
+        for restriction in restrictions:
+            hostname = restriction.get("hostname")
+            if hostname:
+                entries[normalize_hostname(hostname)] = restriction
+
+        if entries != self._entries:
+            self._entries = entries
+            self.version += 1
+
+    def add(self, restriction: dict):
+        """
+        Add or replace a single restriction
+        """
+        hostname = restriction.get("hostname")
+        if not hostname:
+            return
+        self._entries[normalize_hostname(hostname)] = {
+            k: v for k, v in restriction.items() if k != "_id"
+        }
+        self.version += 1
+
+    def match(self, hostname: str) -> Optional[dict]:
+        """
+        Return the restriction covering hostname or any of its parent domains
+        """
+        labels = normalize_hostname(hostname).split(".")
+        # Stop before the bare TLD so "com" never matches everything
+        for i in range(max(len(labels) - 1, 1)):
+            restriction = self._entries.get(".".join(labels[i:]))
+            if restriction is not None:
+                return restriction
+        return None
+
+    def first_match(self, hostnames: Iterable[str]) -> Optional[tuple[str, dict]]:
+        """
+        Check a batch of hostnames in one pass, returning the first restricted one
+        """
+        if not self._entries:
+            return None
+        for hostname in hostnames:
+            restriction = self.match(hostname)
+            if restriction is not None:
+                return hostname, restriction
+        return None
+
+    def snapshot(self, bloom_threshold: int = BLOOM_THRESHOLD) -> dict:
+        """
+        Compact view of the restricted hostnames for clients to match
+        locally, built once per index version. The ETag is a digest of the
+        contents, so it is stable across restarts and workers.
+        """
+        key = (self.version, bloom_threshold)
+        if self._snapshot is not None and self._snapshot[0] == key:
+            return self._snapshot[1]
+
+        hostnames = sorted(self._entries)
+        digest = hashlib.sha256("\n".join(hostnames).encode()).hexdigest()[:32]
+        snapshot = {"etag": f'"{digest}"', "count": len(hostnames)}
+        if len(hostnames) > bloom_threshold:
+            snapshot["bloom"] = bloom_filter(hostnames)
+        else:
+            snapshot["hostnames"] = hostnames
+        self._snapshot = (key, snapshot)
+        return snapshot
+
+    async def refresh(self, repository):
+        """
+        Reload the index from the restriction collection
+        """
+        self.load(await repository.list_restrictions())
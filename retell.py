@@ -0,0 +1,109 @@
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+RETELL_API_URL = "https://api.retellai.com"
+
+# Statuses where Retell did not create the call, so a retry is safe
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class RetellError(Exception):
+    pass
+
+
+class RetellClient:
+    """
+    Shared async client for the Retell phone call API.
+
+    Keeps a pooled keep-alive connection to Retell, caps the number of calls in
+    flight and retries transient failures with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        from_number: str,
+        base_url: str = RETELL_API_URL,
+        max_concurrency: int = 20,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.from_number = from_number
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            },
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def create_phone_call(
+        self,
+        to_number: str,
+        agent_id: Optional[str] = None,
+        dynamic_variables: Optional[dict] = None,
+    ) -> dict:
+        """
+        Place an outbound call and return Retell's call object
+        """
+        payload = {"to_number": to_number, "from_number": self.from_number}
+        if agent_id:
+            payload["override_agent_id"] = agent_id
+        if dynamic_variables:
+            payload["retell_llm_dynamic_variables"] = dynamic_variables
+
+        response = await self._post("/v2/create-phone-call", payload)
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise RetellError(f"Invalid Retell response: {response.text}") from e
+        if not isinstance(data, dict) or "call_id" not in data:
+            raise RetellError(f"No call_id in Retell response: {response.text}")
+        return data
+
+    async def _post(self, path: str, payload: dict) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(path, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached Retell
+                if attempt == self.max_retries:
+                    raise RetellError(f"Could not reach Retell: {e}") from e
+            except httpx.HTTPError as e:
+                # Retell may have created the call, so this is not retried
+                raise RetellError(f"Retell request failed: {e!r}") from e
+            else:
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt == self.max_retries
+                ):
+                    break
+            await asyncio.sleep(self._backoff(attempt))
+
+        if response.status_code >= 400:
+            raise RetellError(
+                f"Retell returned {response.status_code}: {response.text}"
+            )
+        return response
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps bursts of retries from lining up
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
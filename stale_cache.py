@@ -0,0 +1,62 @@
+import asyncio
+import datetime
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class StaleWhileRevalidateCache:
+    """
+    Holds the last result of a slow async loader.
+
+    Readers always get the cached value immediately, even when it is older than
+    the TTL; a stale or missing value only starts a background refresh. At most
+    one refresh runs at a time, and a failed refresh keeps the previous value.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl_sec: float):
+        self.loader = loader
+        self.ttl_sec = ttl_sec
+        self.value = None
+        self.updated_at: Optional[datetime.datetime] = None
+        self.last_error: Optional[str] = None
+        self._loaded_at = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    @property
+    def stale(self) -> bool:
+        return (
+            self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_sec
+        )
+
+    def get(self):
+        """
+        Return the cached value (None before the first load), refreshing in
+        the background if it is stale
+        """
+        if self.stale:
+            self.refresh_in_background()
+        return self.value
+
+    def refresh_in_background(self):
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._load())
+
+    async def refresh(self):
+        """
+        Reload the value and wait for it, joining a refresh already running
+        """
+        self.refresh_in_background()
+        # Shielded so a cancelled caller doesn't cancel the shared refresh
+        await asyncio.shield(self._refreshing)
+
+    async def _load(self):
+        try:
+            value = await self.loader()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Error refreshing cache: {e}")
+            return
+        self.value = value
+        self.updated_at = datetime.datetime.now()
+        self.last_error = None
+        self._loaded_at = time.monotonic()
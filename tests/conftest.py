@@ -0,0 +1,226 @@
+import hashlib
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; don't let Nagle hold the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle_request(self, body: bytes):
+        server: FakeServer = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            status, headers, data = server.respond(self, body)
+            if server.delay:
+                time.sleep(server.delay)
+            if not isinstance(data, bytes):
+                data = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def do_GET(self):
+        self.handle_request(b"")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.handle_request(self.rfile.read(length))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    """
+    Local HTTP server for tests. Records requests, client connections and the
+    peak number of requests in flight, and sleeps delay seconds per request.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def respond(self, request: FakeHandler, body: bytes) -> tuple:
+        """Return (status, headers, body) for a request"""
+        raise NotImplementedError
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close the socket mid-response
+        pass
+
+
+class FakeRetell(FakeServer):
+    """
+    Stand-in for the Retell API. Answers every POST with a new call_id unless
+    a (status, body) is queued in responses.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.responses = []
+
+    def respond(self, request, body):
+        with self.lock:
+            self.requests.append(
+                (request.path, dict(request.headers), json.loads(body))
+            )
+            if self.responses:
+                status, data = self.responses.pop(0)
+            else:
+                status, data = 200, {"call_id": f"call_{len(self.requests)}"}
+        return status, {}, data
+
+
+class FakeCanvas(FakeServer):
+    """
+    Stand-in for the Canvas API under /api/v1. Serves courses, and for each
+    course assignments, submissions and assignment groups split into
+    pages[course id] pages linked with Link: rel="next". Endpoints named in
+    failing answer 503. Every 200 carries an ETag of its body, and a matching
+    If-None-Match gets an empty 304.
+    """
+
+    def __init__(self, pages: dict[int, int], per_page: int = 2):
+        super().__init__()
+        self.pages = pages
+        self.per_page = per_page
+        self.failing = set()
+        self.not_modified = 0
+        # Whether courses apply their assignment group weights
+        self.weighted = False
+
+    def respond(self, request, body):
+        status, headers, data = self.respond_fresh(request)
+        if status != 200:
+            return status, headers, data
+        etag = '"' + hashlib.sha256(json.dumps(data).encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            with self.lock:
+                self.not_modified += 1
+            return 304, {"ETag": etag}, b""
+        return status, {**headers, "ETag": etag}, data
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/v1"
+
+    def respond_fresh(self, request):
+        url = urlsplit(request.path)
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        parts = url.path.removeprefix("/api/v1/").split("/")
+        with self.lock:
+            self.requests.append(request.path)
+
+        if parts[-1] in self.failing:
+            return 503, {}, {"errors": [{"message": "Service unavailable"}]}
+        if parts == ["users", "self"]:
+            return 200, {}, {"id": 1, "name": "Student"}
+        if parts == ["courses"]:
+            return 200, {}, [self.course(course_id) for course_id in self.pages]
+
+        course_id = int(parts[1])
+        endpoint = parts[-1]
+        if endpoint == "assignment_groups":
+            return 200, {}, [{"id": course_id, "group_weight": 100, "rules": {}}]
+        items = [
+            self.item(endpoint, course_id, (page - 1) * self.per_page + n)
+            for n in range(self.per_page)
+        ]
+        headers = {}
+        if page < self.pages[course_id]:
+            next_url = f"{self.url}{url.path}?page={page + 1}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return 200, headers, items
+
+    def course(self, course_id: int) -> dict:
+        return {
+            "id": course_id,
+            "name": f"Course {course_id}",
+            "created_at": "2025-09-01T00:00:00Z",
+            "apply_assignment_group_weights": self.weighted,
+        }
+
+    @staticmethod
+    def item(endpoint: str, course_id: int, n: int) -> dict:
+        assignment_id = course_id * 1000 + n
+        if endpoint == "assignments":
+            return {
+                "id": assignment_id,
+                "name": f"Assignment {n}",
+                "points_possible": 10,
+                "published": True,
+                "assignment_group_id": course_id,
+                "due_at": "2099-01-01T00:00:00Z",
+            }
+        return {
+            "assignment_id": assignment_id,
+            "score": 9 if n % 2 == 0 else None,
+            "workflow_state": "graded" if n % 2 == 0 else "unsubmitted",
+        }
+
+
+def serve(server: FakeServer):
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def fake_retell():
+    server = serve(FakeRetell())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_canvas():
+    servers = []
+
+    def start(pages: dict[int, int], **kwargs) -> FakeCanvas:
+        server = serve(FakeCanvas(pages, **kwargs))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
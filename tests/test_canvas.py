@@ -0,0 +1,141 @@
+import functools
+import time
+
+import pytest
+
+from stale_cache import StaleWhileRevalidateCache
+from tools import canvas
+
+pytestmark = pytest.mark.anyio
+
+# Simulated Canvas round-trip time
+DELAY_SEC = 0.05
+
+# The originals, reachable after monkeypatching
+PageCache = canvas.PageCache
+CanvasClient = canvas.CanvasClient
+
+
+@pytest.fixture
+def canvas_api(fake_canvas, monkeypatch, tmp_path):
+    """Point tools.canvas at a fake Canvas with a fresh page cache per run"""
+
+    def start(pages, max_concurrency=canvas.MAX_CONCURRENT_REQUESTS):
+        server = fake_canvas(pages)
+        server.delay = DELAY_SEC
+        monkeypatch.setattr(canvas, "API_URL", server.api_url)
+        monkeypatch.setattr(canvas, "API_TOKEN", "token")
+        monkeypatch.setattr(
+            canvas,
+            "PageCache",
+            lambda: PageCache(str(tmp_path / str(time.time_ns()))),
+        )
+        monkeypatch.setattr(
+            canvas,
+            "CanvasClient",
+            functools.partial(CanvasClient, max_concurrency=max_concurrency),
+        )
+        return server
+
+    return start
+
+
+async def timed_analysis() -> tuple[str, float]:
+    started = time.perf_counter()
+    report = await canvas.run_canvas_analysis_async()
+    return report, time.perf_counter() - started
+
+
+async def test_report_follows_every_page_in_course_order(canvas_api):
+    server = canvas_api({101: 3, 102: 1, 103: 2})
+    report, _ = await timed_analysis()
+
+    positions = [report.index(f"Course: Course {c} (ID: {c})") for c in (101, 102, 103)]
+    assert positions == sorted(positions)
+    assert "Found 6 assignments." in report
+    assert "Found 2 assignments." in report
+    assert "Found 4 assignments." in report
+    # users/self and courses, then every page of the three per-course endpoints
+    assert len(server.requests) == 2 + 3 * 1 + 2 * (3 + 1 + 2)
+
+
+async def test_benchmark_concurrent_against_serial(canvas_api):
+    """
+    6 courses with 3 pages per paginated endpoint and 50 ms per request, as
+    in the original measurement. One request at a time stands in for the
+    serial walk; the default client should be several times faster.
+    """
+    pages = {course_id: 3 for course_id in range(1, 7)}
+    canvas_api(pages, max_concurrency=1)
+    serial_report, serial_sec = await timed_analysis()
+    canvas_api(pages)
+    report, concurrent_sec = await timed_analysis()
+
+    print(f"\nserial {serial_sec:.2f}s, concurrent {concurrent_sec:.2f}s")
+    assert report == serial_report
+    assert concurrent_sec < serial_sec / 3
+
+
+async def test_wall_time_follows_the_slowest_course(canvas_api):
+    """
+    With enough connections, wall time is the longest chain of pages (one
+    course with 8) rather than the sum over every course
+    """
+    pages = {1: 8, **{course_id: 1 for course_id in range(2, 9)}}
+    server = canvas_api(pages, max_concurrency=32)
+    _, elapsed = await timed_analysis()
+
+    total_requests = len(server.requests)
+    print(f"\n{total_requests} requests in {elapsed:.2f}s")
+    # users/self and courses run together, then the slowest course's 8 pages;
+    # the factor of 2 leaves room for client and server overhead
+    assert elapsed < (1 + 8) * DELAY_SEC * 2
+    assert elapsed < total_requests * DELAY_SEC / 3
+
+
+async def test_canvas_outage_keeps_the_cached_grades(canvas_api):
+    server = canvas_api({101: 1})
+    cache = StaleWhileRevalidateCache(canvas.fetch_grade_summaries, ttl_sec=0)
+    await cache.refresh()
+    assert [course["course_id"] for course in cache.value] == [101]
+
+    server.failing.add("courses")
+    with pytest.raises(RuntimeError, match="Could not retrieve courses"):
+        await canvas.fetch_grade_summaries()
+    await cache.refresh()
+    assert [course["course_id"] for course in cache.value] == [101]
+    assert "Could not retrieve courses" in cache.last_error
+
+
+async def test_weighted_course_without_groups_reports_the_failure(canvas_api):
+    server = canvas_api({101: 1})
+    server.weighted = True
+    server.failing.add("assignment_groups")
+    report, _ = await timed_analysis()
+    summaries = await canvas.fetch_grade_summaries()
+
+    assert "could not fetch the weighted assignment groups" in report
+    assert "No weighted assignment groups" not in report
+    assert summaries[0]["error"] == "Could not fetch assignment groups"
+
+
+async def test_expired_page_is_revalidated_with_a_304(canvas_api, tmp_path):
+    server = canvas_api({101: 1})
+    url = f"{server.api_url}/courses/101/assignments"
+    cache = PageCache(str(tmp_path / "pages"))
+    async with CanvasClient(page_cache=cache) as client:
+        data, _ = await client.get_page(url)
+        entry = cache.load(url)
+        assert entry["etag"]
+
+        # Age the stored page past its TTL
+        entry["fetched_at"] -= canvas.endpoint_ttl(url) + 1
+        cache.save(url, entry)
+        revalidated, _ = await client.get_page(url)
+        # The 304 renewed the page, so this one is served without a request
+        fresh, _ = await client.get_page(url)
+
+    assert revalidated == fresh == data
+    assert (cache.misses, cache.revalidated, cache.fresh_hits) == (1, 1, 1)
+    assert server.not_modified == 1
+    assert len(server.requests) == 2
@@ -0,0 +1,97 @@
+"""
+Accuracy checks for transcript compaction against the fixture transcripts.
+
+The offline checks confirm nothing extraction relies on is dropped: every
+user turn, every time or date, and the phrases listed in expected.json. The
+live check runs the real extraction prompt on the raw and compacted text
+and compares the results; it needs GEMINI_API_KEY and is skipped otherwise.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from compaction import TranscriptCompactor, _facts, parse_turns
+from extraction import RESPONSE_SCHEMA, build_prompt
+
+FIXTURES = Path(__file__).parent / "fixtures" / "transcripts"
+EXPECTED = json.loads((FIXTURES / "expected.json").read_text())
+TRANSCRIPTS = {name: (FIXTURES / f"{name}.txt").read_text() for name in EXPECTED}
+
+
+@pytest.fixture(params=sorted(TRANSCRIPTS))
+def transcript(request):
+    return request.param, TRANSCRIPTS[request.param]
+
+
+def user_text(transcript: str) -> str:
+    # Dropping an agent turn merges the user turns around it, so compare the
+    # user's words as one run
+    return " ".join(
+        text for speaker, text in parse_turns(transcript) if speaker == "User"
+    )
+
+
+def test_keeps_every_user_turn(transcript):
+    _, raw = transcript
+    assert user_text(TranscriptCompactor().compact(raw)) == user_text(raw)
+
+
+def test_keeps_every_time_and_date(transcript):
+    _, raw = transcript
+    compacted = TranscriptCompactor().compact(raw)
+    assert _facts(raw) <= _facts(compacted)
+
+
+def test_keeps_expected_phrases(transcript):
+    name, raw = transcript
+    compacted = TranscriptCompactor().compact(raw).lower()
+    for phrase in EXPECTED[name]:
+        assert phrase.lower() in compacted
+
+
+def test_shrinks_conversations():
+    compactor = TranscriptCompactor()
+    for name, raw in TRANSCRIPTS.items():
+        compacted = compactor.compact(raw)
+        if parse_turns(raw):
+            assert len(compacted) < len(raw), name
+        else:
+            assert compacted == raw
+    assert compactor.stats()["saved_ratio"] > 0.3
+
+
+def extraction_keys(model, transcript: str) -> tuple[set, set]:
+    genai = pytest.importorskip("google.generativeai")
+    response = model.generate_content(
+        build_prompt(transcript, "+15550100", "2025-09-04T09:00:00"),
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA,
+            temperature=0,
+        ),
+    )
+    data = json.loads(response.text)
+    restrictions = {
+        item["hostname"].lower().removeprefix("www.")
+        for item in data.get("restrictions", [])
+    }
+    # Recurring reminders are identified by their days, one-offs by their date
+    reminders = {
+        (item["time"], item.get("days") or item["date"])
+        for item in data.get("reminders", [])
+    }
+    return restrictions, reminders
+
+
+@pytest.mark.skipif(not os.getenv("GEMINI_API_KEY"), reason="needs GEMINI_API_KEY")
+def test_extraction_matches_raw_transcript(transcript):
+    genai = pytest.importorskip("google.generativeai")
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(model_name="gemini-2.0-flash")
+
+    _, raw = transcript
+    compacted = TranscriptCompactor().compact(raw)
+    assert extraction_keys(model, compacted) == extraction_keys(model, raw)
@@ -0,0 +1,123 @@
+import pytest
+
+from tools.canvas import calculate_needed_score
+from tools.grades import CourseGrade, DropSet, GradeBook
+
+
+def test_drop_lowest_keeps_one_graded_item():
+    drops = DropSet(2)
+    drops.add("a", 5, 10)
+    assert drops.dropped_points == 0
+    drops.add("b", 8, 10)
+    assert (drops.dropped_score, drops.dropped_points) == (5, 10)
+    drops.add("c", 9, 10)
+    assert (drops.dropped_score, drops.dropped_points) == (13, 20)
+    drops.remove("c")
+    assert (drops.dropped_score, drops.dropped_points) == (5, 10)
+
+
+def weighted_course(exam_score):
+    """
+    Homework (10%) fully graded at 100%; exams (90%) with one graded exam
+    and one still to come. Far more raw points sit in homework.
+    """
+    groups = [
+        {"id": "hw", "group_weight": 10},
+        {"id": "exam", "group_weight": 90},
+    ]
+    assignments = [
+        {
+            "id": 1,
+            "points_possible": 1000,
+            "published": True,
+            "assignment_group_id": "hw",
+        },
+        {
+            "id": 2,
+            "points_possible": 50,
+            "published": True,
+            "assignment_group_id": "exam",
+        },
+        {
+            "id": 3,
+            "points_possible": 50,
+            "published": True,
+            "assignment_group_id": "exam",
+        },
+    ]
+    submissions = [
+        {"assignment_id": 1, "score": 1000, "workflow_state": "graded"},
+        {"assignment_id": 2, "score": exam_score, "workflow_state": "graded"},
+    ]
+    return groups, assignments, submissions
+
+
+def test_weighted_report_uses_weights_for_every_figure():
+    groups, assignments, submissions = weighted_course(exam_score=25)
+    lines = []
+    grade = calculate_needed_score(
+        assignments, submissions, 93.0, lines, assignment_groups=groups, weighted=True
+    )
+    report = "\n".join(lines)
+
+    # 1025 of 1100 raw points would clear 93%, but by weight 32.5% is secured
+    assert grade.secured_percentage() == 32.5
+    assert "already achieved" not in report
+    assert "Grade Secured (Weighted):      32.50%" in report
+    assert "Still Needed for 93.0%:     60.50 percentage points" in report
+    assert "you need an average of 134.44%" in report
+
+
+def test_weighted_report_when_target_is_secured():
+    groups, assignments, submissions = weighted_course(exam_score=50)
+    lines = []
+    calculate_needed_score(
+        assignments, submissions, 50.0, lines, assignment_groups=groups, weighted=True
+    )
+    report = "\n".join(lines)
+
+    assert "Target of 50.0% already achieved or exceeded!" in report
+    assert "You are currently 5.00 percentage points above" in report
+
+
+def test_unweighted_report_in_points():
+    groups, assignments, submissions = weighted_course(exam_score=25)
+    lines = []
+    grade = calculate_needed_score(
+        assignments, submissions, 95.0, lines, assignment_groups=groups
+    )
+    report = "\n".join(lines)
+
+    assert isinstance(grade, CourseGrade)
+    assert "Target Score for 95.0%:      1045.00 points" in report
+    assert "Points Still Needed:           20.00" in report
+    assert "you need an average of 40.00%" in report
+    assert "(20.00 points needed)" in report
+
+
+def test_grade_book_applies_only_changes():
+    groups, assignments, submissions = weighted_course(exam_score=25)
+    book = GradeBook()
+    grade, rejected = book.update(7, assignments, submissions, groups, True)
+    assert rejected == []
+    assert grade.secured_percentage() == 32.5
+
+    # The second exam is graded; the same CourseGrade picks it up
+    submissions = submissions + [
+        {"assignment_id": 3, "score": 50, "workflow_state": "graded"}
+    ]
+    again, _ = book.update(7, assignments, submissions, groups, True)
+    assert again is grade
+    assert grade.secured_percentage() == pytest.approx(77.5)
+    assert grade.needed_for([90.0]) == {90.0: None}
+
+    # A removed assignment takes its score with it
+    again, _ = book.update(7, assignments[:2], submissions, groups, True)
+    assert again is grade
+    assert grade.secured_percentage() == pytest.approx(55.0)
+
+    # New group weights rebuild the course
+    groups = [dict(groups[0], group_weight=50), dict(groups[1], group_weight=50)]
+    rebuilt, _ = book.update(7, assignments, submissions, groups, True)
+    assert rebuilt is not grade
+    assert rebuilt.secured_percentage() == pytest.approx(87.5)
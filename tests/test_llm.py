@@ -0,0 +1,36 @@
+from contextlib import aclosing
+
+import pytest
+
+from llm import LLMGateway
+
+pytestmark = pytest.mark.anyio
+
+
+class Chunk:
+    usage_metadata = None
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        async def chunks():
+            for text in ("a", "b", "c"):
+                yield Chunk(text)
+
+        return chunks()
+
+
+async def test_abandoned_stream_releases_slot():
+    llm = LLMGateway(FakeModel(), max_concurrency=1)
+    async with aclosing(llm.stream("prompt")) as response:
+        async for chunk in response:
+            break
+    assert llm.in_flight == 0
+    assert not llm._slots.locked()
+
+    texts = [chunk.text async for chunk in llm.stream("prompt")]
+    assert texts == ["a", "b", "c"]
+    assert llm.stats()["calls"] == 2
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from retell import RetellClient, RetellError
+
+pytestmark = pytest.mark.anyio
+
+# Event-loop lag allowed at the 99th percentile during the 500-call burst
+LOOP_LAG_P99_MS = 50
+
+
+def client(fake_retell, **kwargs) -> RetellClient:
+    kwargs.setdefault("backoff_base", 0.001)
+    return RetellClient("key", "+15550000000", base_url=fake_retell.url, **kwargs)
+
+
+async def test_create_phone_call(fake_retell):
+    retell = client(fake_retell)
+    call = await retell.create_phone_call(
+        "+15551234567", agent_id="agent", dynamic_variables={"a": "b"}
+    )
+    await retell.close()
+
+    assert call["call_id"] == "call_1"
+    path, headers, payload = fake_retell.requests[0]
+    assert path == "/v2/create-phone-call"
+    assert headers["Authorization"] == "Bearer key"
+    assert payload == {
+        "to_number": "+15551234567",
+        "from_number": "+15550000000",
+        "override_agent_id": "agent",
+        "retell_llm_dynamic_variables": {"a": "b"},
+    }
+
+
+async def test_retries_transient_statuses(fake_retell):
+    fake_retell.responses = [(503, {}), (429, {})]
+    retell = client(fake_retell)
+    call = await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+    assert call["call_id"] == "call_3"
+    assert len(fake_retell.requests) == 3
+
+
+async def test_gives_up_after_max_retries(fake_retell):
+    fake_retell.responses = [(503, {})] * 4
+    retell = client(fake_retell, max_retries=3)
+    with pytest.raises(RetellError, match="503"):
+        await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+    assert len(fake_retell.requests) == 4
+
+
+async def test_client_error_is_not_retried(fake_retell):
+    fake_retell.responses = [(400, {"error": "bad number"})]
+    retell = client(fake_retell)
+    with pytest.raises(RetellError, match="400"):
+        await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+    assert len(fake_retell.requests) == 1
+
+
+@pytest.mark.parametrize("body", [b"<html>oops</html>", b"[]", b'{"status": "ok"}'])
+async def test_unexpected_body_raises_retell_error(fake_retell, body):
+    fake_retell.responses = [(200, body)]
+    retell = client(fake_retell)
+    with pytest.raises(RetellError):
+        await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+
+async def test_read_timeout_raises_retell_error_without_retry(fake_retell):
+    fake_retell.delay = 0.5
+    retell = client(fake_retell, timeout=0.1)
+    with pytest.raises(RetellError, match="ReadTimeout"):
+        await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+    # Retell may have placed the call, so it must not be placed again
+    assert len(fake_retell.requests) == 1
+
+
+async def test_unreachable_server_raises_retell_error():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    retell = RetellClient(
+        "key", "+15550000000", base_url=f"http://127.0.0.1:{port}", backoff_base=0.001
+    )
+    with pytest.raises(RetellError, match="Could not reach Retell"):
+        await retell.create_phone_call("+15551234567")
+    await retell.close()
+
+
+async def loop_lag_probe(lags: list, interval: float = 0.005):
+    """Record how late each short sleep wakes up, in ms, until cancelled"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def test_500_concurrent_calls(fake_retell):
+    """
+    A burst of 500 calls, some hitting transient 503s, all complete while
+    staying under the concurrency cap and reusing pooled connections, and
+    the event loop keeps answering on time throughout
+    """
+    fake_retell.delay = 0.005
+    fake_retell.responses = [(503, {})] * 50
+    retell = client(fake_retell, max_concurrency=20)
+    lags = []
+    probe = asyncio.create_task(loop_lag_probe(lags))
+    calls = await asyncio.gather(
+        *(retell.create_phone_call(f"+1555{i:07d}") for i in range(500))
+    )
+    probe.cancel()
+    await retell.close()
+
+    lags.sort()
+    assert len(lags) > 10
+    assert lags[int(len(lags) * 0.99)] < LOOP_LAG_P99_MS
+
+    assert len({call["call_id"] for call in calls}) == 500
+    assert len(fake_retell.requests) == 550
+    assert fake_retell.max_in_flight <= 20
+    assert len(fake_retell.connections) <= 20
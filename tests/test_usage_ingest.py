@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import pytest
+
+from usage_ingest import MAX_USAGE_BODY, UsageIngestError, decode_body, parse_batch
+
+REPORT = {
+    "client_id": "c1",
+    "seq": 3,
+    "email": "a@example.com",
+    "date": "2025-09-01",
+    "deltas": {"example.com": 30},
+}
+
+
+def test_decodes_gzip_json():
+    body = gzip.compress(json.dumps(REPORT).encode())
+    batch = parse_batch(decode_body(body, "application/json", "gzip"))
+    assert (batch.seq, batch.deltas) == (3, {"example.com": 30})
+
+
+def test_rejects_truncated_gzip():
+    body = gzip.compress(json.dumps(REPORT).encode())
+    with pytest.raises(UsageIngestError, match="Truncated"):
+        decode_body(body[:-8], "application/json", "gzip")
+
+
+def test_rejects_trailing_data_after_gzip():
+    body = gzip.compress(json.dumps(REPORT).encode()) + b"junk"
+    with pytest.raises(UsageIngestError, match="Trailing"):
+        decode_body(body, "application/json", "gzip")
+
+
+def test_rejects_oversized_gzip():
+    body = gzip.compress(b" " * (MAX_USAGE_BODY + 1))
+    with pytest.raises(UsageIngestError, match="too large"):
+        decode_body(body, "application/json", "gzip")
+
+
+def test_rejects_negative_deltas():
+    with pytest.raises(UsageIngestError):
+        parse_batch({**REPORT, "deltas": {"example.com": -1}})
+
+
+@pytest.mark.parametrize("date", ["10/17/2026", "2026-10-32", "20261017", ""])
+def test_rejects_non_iso_dates(date):
+    with pytest.raises(UsageIngestError, match="YYYY-MM-DD"):
+        parse_batch({**REPORT, "date": date})
@@ -1,27 +1,172 @@
+import asyncio
 import datetime
+import hashlib
 from dotenv import load_dotenv
-import requests
+import httpx
 import os
 import json
+import time
+
+from tools.grades import GradeBook
 
 load_dotenv()  # Load environment variables from .env file
 
-API_URL = "https://canvas.eee.uci.edu/api/v1"
+API_URL = os.getenv("CANVAS_API_URL", "https://canvas.eee.uci.edu/api/v1")
 TARGET_GRADE_PERCENTAGE = 93.0
+# Targets reported by the structured grade summary
+GRADE_TARGETS = (93.0, 90.0, 80.0, 70.0)
+
+# Requests in flight at once, shared by every course
+MAX_CONCURRENT_REQUESTS = 8
+# Canvas refills each token's rate-limit bucket over time; slow down when low
+RATE_LIMIT_LOW_WATER = 100.0
+RATE_LIMIT_BACKOFF_SEC = 1.0
+
+# Pages are kept on disk with their validators and reused within these TTLs;
+# after that they are revalidated with If-None-Match / If-Modified-Since
+CACHE_DIR = os.getenv("CANVAS_CACHE_DIR", ".canvas_cache")
+ENDPOINT_TTLS = {
+    "courses": 3600,
+    "assignments": 900,
+    "assignment_groups": 900,
+    "submissions": 300,
+}
+DEFAULT_TTL = 300
 
 API_TOKEN = os.getenv("CANVAS_API_KEY")
 
-if not API_TOKEN:
-    print("Error: CANVAS_API_KEY environment variable not set.")
-    print("Please set the environment variable before running the script.")
-    exit(1)  # Exit if the token is not found
-
 headers = {"Authorization": f"Bearer {API_TOKEN}"}
 
+# Grade state per course, updated incrementally on each refresh
+GRADE_BOOK = GradeBook()
+
 # --- Helper Functions ---
 
 
-def make_paginated_request(url, params=None, output_lines=None):
+class PageCache:
+    """
+    On-disk store of Canvas API pages with their ETag / Last-Modified headers
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+
+    def load(self, url):
+        try:
+            with open(self._path(url)) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, url, entry):
+        # Write then rename so a crash never leaves a half-written page
+        path = self._path(url)
+        with open(path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+
+def endpoint_ttl(url):
+    """Picks the cache TTL from the last path segment of a Canvas URL."""
+    return ENDPOINT_TTLS.get(httpx.URL(url).path.rstrip("/").split("/")[-1], DEFAULT_TTL)
+
+
+class CanvasClient:
+    """
+    Pooled async HTTP client for the Canvas API.
+
+    A semaphore bounds concurrent requests, and the X-Rate-Limit-Remaining
+    header Canvas returns is tracked so requests back off before the token's
+    quota runs dry instead of after Canvas starts answering 403.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, page_cache=None):
+        self.page_cache = page_cache
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limit_remaining = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+
+    async def get(self, url, params=None, headers=None):
+        async with self._semaphore:
+            response = await self._client.get(url, params=params, headers=headers)
+            remaining = response.headers.get("X-Rate-Limit-Remaining")
+            if remaining is not None:
+                self.rate_limit_remaining = float(remaining)
+            # Hold the slot while backing off so the other requests slow down too
+            if response.status_code == 403 and "Rate Limit Exceeded" in response.text:
+                await asyncio.sleep(RATE_LIMIT_BACKOFF_SEC * 4)
+                response = await self._client.get(
+                    url, params=params, headers=headers
+                )
+            elif (
+                self.rate_limit_remaining is not None
+                and self.rate_limit_remaining < RATE_LIMIT_LOW_WATER
+            ):
+                await asyncio.sleep(RATE_LIMIT_BACKOFF_SEC)
+        return response
+
+    async def get_page(self, url, params=None):
+        """
+        Fetches one page of a list endpoint, returning (data, next page url).
+        Served from the page cache while fresh, and revalidated with a
+        conditional request once its TTL has passed.
+        """
+        if params:
+            url = str(httpx.URL(url, params=params))
+        cache = self.page_cache
+        entry = cache.load(url) if cache else None
+
+        if entry and time.time() - entry["fetched_at"] < endpoint_ttl(url):
+            cache.fresh_hits += 1
+            return entry["data"], entry["next"]
+
+        request_headers = {}
+        if entry and entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await self.get(url, headers=request_headers)
+        if response.status_code == 304 and entry:
+            cache.revalidated += 1
+        else:
+            response.raise_for_status()
+            entry = {
+                "data": response.json(),
+                "next": response.links.get("next", {}).get("url"),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            if cache:
+                cache.misses += 1
+
+        if cache:
+            entry["fetched_at"] = time.time()
+            cache.save(url, entry)
+        return entry["data"], entry["next"]
+
+
+async def make_paginated_request(client, url, params=None, output_lines=None):
     """
     Makes requests to a Canvas API endpoint, handling pagination.
     Returns a list of all items retrieved. Appends errors to output_lines.
@@ -29,12 +174,11 @@ def make_paginated_request(url, params=None, output_lines=None):
     results = []
     next_url = url
     while next_url:
+        response = None
         try:
-            response = requests.get(next_url, headers=headers, params=params)
+            data, next_page = await client.get_page(next_url, params=params)
             # Clear params after the first request, as the next_url includes them
             params = None
-            response.raise_for_status()
-            data = response.json()
             if isinstance(data, dict):
                 warning_msg = f"Warning: Received dict instead of list from {next_url}"
                 print(warning_msg)  # Keep console warning for this case
@@ -43,15 +187,11 @@ def make_paginated_request(url, params=None, output_lines=None):
                 return [data]  # Return the dict wrapped in a list
             results.extend(data)
 
-            # Check for 'next' link in the Link header
-            next_url = None
-            if "Link" in response.headers:
-                links = requests.utils.parse_header_links(response.headers["Link"])
-                for link in links:
-                    if link.get("rel") == "next":
-                        next_url = link.get("url")
-                        break
-        except requests.exceptions.RequestException as e:
+            # The 'next' link from the Link header
+            next_url = next_page
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.HTTPStatusError):
+                response = e.response
             error_msg = f"Error during paginated request to {url}: {e}"
             print(error_msg)  # Keep console error
             if output_lines is not None:
@@ -80,29 +220,34 @@ def make_paginated_request(url, params=None, output_lines=None):
 # --- API Functions ---
 
 
-def get_user_info(output_lines):
+async def get_user_info(client, output_lines):
     """Fetches user information from Canvas and appends it to output_lines."""
     output_lines.append("\n--- Fetching User Info ---")
     endpoint = f"{API_URL}/users/self"
     try:
-        response = requests.get(endpoint, headers=headers)
+        response = await client.get(endpoint)
         response.raise_for_status()
         user_data = response.json()
         output_lines.append(json.dumps(user_data, indent=2))  # Append pretty print
         return user_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         error_msg = f"Error fetching user info: {e}"
         print(error_msg)  # Keep console error
         output_lines.append(error_msg)
         return None
 
 
-def get_my_courses(output_lines):
-    """Fetches active courses and appends info to output_lines."""
+async def get_my_courses(client, output_lines):
+    """
+    Fetches active courses and appends info to output_lines.
+    Returns None if the course list could not be retrieved.
+    """
     output_lines.append("\n--- Fetching Courses ---")
     endpoint = f"{API_URL}/courses"
     params = {"enrollment_state": "active", "per_page": 50}
-    courses = make_paginated_request(endpoint, params=params, output_lines=output_lines)
+    courses = await make_paginated_request(
+        client, endpoint, params=params, output_lines=output_lines
+    )
     final_courses = []
     if courses:
         output_lines.append(f"Found {len(courses)} active courses.")
@@ -123,35 +268,61 @@ def get_my_courses(output_lines):
             final_courses.append(course)
     else:
         output_lines.append("Could not retrieve courses.")
-    return final_courses
+    return None if courses is None else final_courses
 
 
-def get_assignments(course_id, course_name, output_lines):
+def next_due_date(assignments):
+    """Returns the earliest upcoming due date among unsubmitted assignments, or None."""
+    least_due_date = None
+    for assign in assignments:
+        due_date = assign.get("due_at")
+        if assign.get("has_submitted_submissions"):
+            # Skip assignments that have been submitted
+            continue
+        if due_date:
+            if due_date < datetime.datetime.now().isoformat():
+                continue
+            due_date_obj = datetime.date.fromisoformat(due_date[: len("YYYY-MM-DD")])
+            if least_due_date is None or due_date_obj < least_due_date:
+                least_due_date = due_date_obj
+    return least_due_date
+
+
+def upcoming_deadlines(course, assignments):
+    """Returns the unsubmitted assignments of a course that are due in the future."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    deadlines = []
+    for assign in assignments:
+        due_at = assign.get("due_at")
+        if not due_at or assign.get("has_submitted_submissions"):
+            continue
+        due = datetime.datetime.fromisoformat(due_at.replace("Z", "+00:00"))
+        if due <= now:
+            continue
+        deadlines.append(
+            {
+                "course_id": course.get("id"),
+                "course_name": course.get("name", "Unnamed Course"),
+                "assignment_id": assign.get("id"),
+                "name": assign.get("name", "Unnamed Assignment"),
+                "due_at": due_at,
+            }
+        )
+    return deadlines
+
+
+async def get_assignments(client, course_id, course_name, output_lines):
     """Fetches assignments and appends info to output_lines."""
     output_lines.append(
         f"\n--- Fetching Assignments for Course: {course_name} (ID: {course_id}) ---"
     )
     endpoint = f"{API_URL}/courses/{course_id}/assignments"
     params = {"per_page": 100}  # Get more per page if needed
-    assignments = make_paginated_request(
-        endpoint, params=params, output_lines=output_lines
+    assignments = await make_paginated_request(
+        client, endpoint, params=params, output_lines=output_lines
     )
     if assignments:
-        least_due_date = None
-        for assign in assignments:
-            due_date = assign.get("due_at")
-            if assign["has_submitted_submissions"]:
-                # Skip assignments that have been submitted
-                continue
-            # !!!
-            if due_date:
-                if due_date < datetime.datetime.now().isoformat():
-                    continue
-                due_date_obj = datetime.date.fromisoformat(
-                    due_date[: len("YYYY-MM-DD")]
-                )
-                if least_due_date is None or due_date_obj < least_due_date:
-                    least_due_date = due_date_obj
+        least_due_date = next_due_date(assignments)
         if least_due_date:
             output_lines.append(
                 f"Next assignment due date: {least_due_date.strftime('%Y-%m-%d')}"
@@ -162,15 +333,15 @@ def get_assignments(course_id, course_name, output_lines):
     return assignments
 
 
-def get_my_submissions(course_id, course_name, output_lines):
+async def get_my_submissions(client, course_id, course_name, output_lines):
     """Fetches submissions and appends info to output_lines."""
     output_lines.append(
         f"\n--- Fetching Your Submissions for Course: {course_name} (ID: {course_id}) ---"
     )
     endpoint = f"{API_URL}/courses/{course_id}/students/submissions"
     params = {"student_ids[]": "self", "include[]": "assignment", "per_page": 100}
-    submissions = make_paginated_request(
-        endpoint, params=params, output_lines=output_lines
+    submissions = await make_paginated_request(
+        client, endpoint, params=params, output_lines=output_lines
     )
     if submissions:
         output_lines.append(f"Found {len(submissions)} submissions for you.")
@@ -179,84 +350,82 @@ def get_my_submissions(course_id, course_name, output_lines):
     return submissions
 
 
+async def get_assignment_groups(client, course_id, output_lines):
+    """Fetches assignment groups with their weights and drop rules."""
+    endpoint = f"{API_URL}/courses/{course_id}/assignment_groups"
+    params = {"per_page": 100}
+    return await make_paginated_request(
+        client, endpoint, params=params, output_lines=output_lines
+    )
+
+
 # --- Calculation Function ---
 
 
 def calculate_needed_score(
-    assignments, submissions, target_percentage, output_lines: list
+    assignments,
+    submissions,
+    target_percentage,
+    output_lines: list,
+    assignment_groups=None,
+    weighted=False,
+    course_id=None,
+    grade_book=None,
 ):
     """
     Estimates the percentage needed on remaining assignments. Appends results to output_lines.
+    Applies assignment group weights and drop rules when the groups are given.
+    With a grade_book, only what changed since the course's last update is applied.
+    Returns the course's CourseGrade, or None if it could not be calculated.
     """
     output_lines.append(
-        f"\n--- Calculating Score Needed for {target_percentage}% (Simplified) ---"
+        f"\n--- Calculating Score Needed for {target_percentage}% ({'Weighted' if weighted else 'Simplified'}) ---"
     )
     if assignments is None or submissions is None:
         output_lines.append(
             "Cannot calculate score: Missing assignments or submissions data."
         )
-        return
-
-    total_points_possible = 0.0
-    total_score_earned = 0.0
-    remaining_points_possible = 0.0
-    graded_points_possible = 0.0  # Track points for graded items
-
-    submissions_dict = {sub.get("assignment_id"): sub for sub in submissions}
+        return None
 
-    for assign in assignments:
-        # Consider only published assignments with positive points possible
-        # Skip assignments in 'Never Drop' groups if needed (more complex logic)
-        if (
-            assign.get("published")
-            and assign.get("points_possible") is not None
-            and assign.get("points_possible") > 0
-        ):
-            points = float(assign["points_possible"])
-            assignment_id = assign.get("id")
-            submission = submissions_dict.get(assignment_id)
-
-            # Always add to total possible points for the course
-            total_points_possible += points
-
-            # Check submission status to categorize points
-            # Ensure score is not None before attempting float conversion
-            if (
-                submission
-                and submission.get("score") is not None
-                and (
-                    submission.get("workflow_state") == "graded"
-                    or submission.get("graded_at")
-                )
-            ):
-                # Graded submission
-                try:
-                    total_score_earned += float(submission["score"])
-                    graded_points_possible += points
-                except (ValueError, TypeError):
-                    warning_msg = f"Warning: Could not convert score '{submission['score']}' to float for assignment ID {assignment_id}. Skipping."
-                    print(warning_msg)  # Keep console warning
-                    output_lines.append(warning_msg)
-                    remaining_points_possible += (
-                        points  # Treat as ungraded if score is invalid
-                    )
-            else:
-                # Ungraded, not submitted, submitted but score is null, or score conversion failed
-                remaining_points_possible += points
+    if grade_book is None:
+        grade_book = GradeBook()
+    grade, rejected = grade_book.update(
+        course_id, assignments, submissions, assignment_groups, weighted
+    )
+    for submission in rejected:
+        warning_msg = f"Warning: Could not convert score '{submission['score']}' to float for assignment ID {submission.get('assignment_id')}. Skipping."
+        print(warning_msg)  # Keep console warning
+        output_lines.append(warning_msg)
 
+    total_points_possible = grade.total_possible
     if total_points_possible == 0:
         output_lines.append(
             "Cannot calculate score: No assignments with points found or processed."
         )
-        return
+        return None
 
-    current_percentage = (
-        (total_score_earned / graded_points_possible) * 100
-        if graded_points_possible > 0
-        else 0.0
-    )
-    target_total_score = (target_percentage / 100.0) * total_points_possible
-    points_needed = target_total_score - total_score_earned
+    total_score_earned = grade.earned
+    graded_points_possible = grade.graded_possible
+    remaining_points_possible = grade.remaining_possible
+    current_percentage = grade.current_percentage()
+    # Every figure below comes from the grade's own model, so weighted courses
+    # are judged on group weights rather than raw points
+    secured_percentage = grade.secured_percentage()
+    if secured_percentage is None:
+        output_lines.append(
+            "Cannot calculate score: No weighted assignment groups with points found."
+        )
+        return None
+    percentage_needed_on_remaining = grade.needed_for([target_percentage])[
+        target_percentage
+    ]
+    # Final-grade percentage points still missing for the target
+    gap = target_percentage - secured_percentage
+
+    def amount(percentage_points):
+        if weighted:
+            return f"{percentage_points:.2f} percentage points"
+        return f"{percentage_points / 100.0 * total_points_possible:.2f} points"
 
     # --- Append Results ---
     output_lines.append(f"Total Points Possible (Course): {total_points_possible:.2f}")
@@ -266,46 +435,53 @@ def calculate_needed_score(
     output_lines.append(
         f"Points Possible (Remaining):   {remaining_points_possible:.2f}"
     )
-    output_lines.append(
-        f"Target Score for {target_percentage:.1f}%:      {target_total_score:.2f} points"
-    )
-    output_lines.append(f"Points Still Needed:           {max(0, points_needed):.2f}")
+    if weighted:
+        output_lines.append(
+            f"Grade Secured (Weighted):      {secured_percentage:.2f}%"
+        )
+        output_lines.append(
+            f"Still Needed for {target_percentage:.1f}%:     {amount(max(0, gap))}"
+        )
+    else:
+        target_total_score = (target_percentage / 100.0) * total_points_possible
+        output_lines.append(
+            f"Target Score for {target_percentage:.1f}%:      {target_total_score:.2f} points"
+        )
+        output_lines.append(
+            f"Points Still Needed:           {max(0, gap) / 100.0 * total_points_possible:.2f}"
+        )
 
     # --- Final Conclusion ---
-    if remaining_points_possible <= 0:
-        if total_score_earned >= target_total_score:
-            points_over_target = total_score_earned - target_total_score
+    if percentage_needed_on_remaining is None:
+        # Nothing left to grade: the secured grade is the final grade
+        if gap <= 0:
             output_lines.append(
                 f"\n>>> Conclusion: Target already achieved or exceeded! (All points graded)"
             )
             output_lines.append(
-                f"   You are {points_over_target:.2f} points above the score needed for {target_percentage:.1f}%."
+                f"   You are {amount(-gap)} above the score needed for {target_percentage:.1f}%."
             )
         else:
             output_lines.append(
                 f"\n>>> Conclusion: Target of {target_percentage:.1f}% not met. (All points graded)"
             )
-            output_lines.append(f"   You were {abs(points_needed):.2f} points short.")
-    elif points_needed <= 0:
-        points_over_target = -points_needed
+            output_lines.append(f"   You were {amount(gap)} short.")
+    elif gap <= 0:
         output_lines.append(
             f"\n>>> Conclusion: Target of {target_percentage:.1f}% already achieved or exceeded!"
         )
         output_lines.append(
-            f"   You are currently {points_over_target:.2f} points above the total score needed."
+            f"   You are currently {amount(-gap)} above the total score needed."
         )
         output_lines.append(
             f"   You need 0 points from the remaining {remaining_points_possible:.2f} points to maintain this target."
         )
     else:
-        percentage_needed_on_remaining = (
-            points_needed / remaining_points_possible
-        ) * 100.0
         output_lines.append(
             f"\n>>> Conclusion: To achieve {target_percentage:.1f}%, you need an average of {percentage_needed_on_remaining:.2f}%"
         )
         output_lines.append(
-            f"   on the remaining {remaining_points_possible:.2f} points possible ({points_needed:.2f} points needed)."
+            f"   on the remaining {remaining_points_possible:.2f} points possible ({amount(gap)} needed)."
         )
         if percentage_needed_on_remaining > 100:
             output_lines.append(
@@ -316,12 +492,122 @@ def calculate_needed_score(
                 "   (Warning: Target may be difficult/unrealistic without significant extra credit)"
             )
 
+    return grade
+
 
 # --- Main Execution ---
 
 
-def run_canvas_analysis():
-    """Runs the full analysis and returns the output as a single string."""
+async def analyze_course(
+    client, course, targets=GRADE_TARGETS, grade_book=GRADE_BOOK
+):
+    """
+    Fetches one course's assignments and submissions concurrently.
+    Returns its report lines and a structured summary of the grade.
+    """
+    course_id = course.get("id")
+    course_name = course.get("name", "Unnamed Course")  # Default name
+    summary = {
+        "course_id": course_id,
+        "name": course_name,
+        "next_due_date": None,
+        "current_percentage": None,
+        "needed": {},
+    }
+    if not course_id:
+        # This case should be less likely if get_my_courses worked, but good to handle
+        summary["error"] = "Course has no ID"
+        return [f"\nSkipping course '{course_name}' because it has no ID."], summary
+
+    # Separate buffers keep each section's lines together despite running concurrently
+    assignment_lines, submission_lines, score_lines = [], [], []
+    assignments, submissions, groups = await asyncio.gather(
+        get_assignments(client, course_id, course_name, assignment_lines),
+        get_my_submissions(client, course_id, course_name, submission_lines),
+        get_assignment_groups(client, course_id, score_lines),
+    )
+    weighted = bool(course.get("apply_assignment_group_weights"))
+    if weighted and groups is None:
+        # The weights live on the groups, so no grade can be judged without them
+        summary["error"] = "Could not fetch assignment groups"
+        score_lines.append(
+            f"\nSkipping grade calculation: could not fetch the weighted assignment groups for course {course_name} (ID: {course_id})."
+        )
+    elif assignments is not None and submissions is not None:
+        if groups is None:
+            score_lines.append(
+                "Warning: Could not fetch assignment groups; drop rules are not applied."
+            )
+        grade = calculate_needed_score(
+            assignments,
+            submissions,
+            TARGET_GRADE_PERCENTAGE,
+            score_lines,
+            assignment_groups=groups,
+            weighted=weighted,
+            course_id=course_id,
+            grade_book=grade_book,
+        )
+        due = next_due_date(assignments)
+        summary["next_due_date"] = due.isoformat() if due else None
+        if grade is not None:
+            summary["current_percentage"] = round(grade.current_percentage(), 2)
+            summary["needed"] = {
+                f"{target:g}": None if needed is None else round(needed, 2)
+                for target, needed in grade.needed_for(targets).items()
+            }
+    else:
+        summary["error"] = "Could not fetch assignments or submissions"
+        score_lines.append(
+            f"\nSkipping grade calculation due to errors fetching assignments or submissions for course {course_name} (ID: {course_id})."
+        )
+    return assignment_lines + submission_lines + score_lines, summary
+
+
+async def fetch_grade_summaries(targets=GRADE_TARGETS):
+    """Returns a structured grade summary per active course, for the API."""
+    if not API_TOKEN:
+        raise RuntimeError("CANVAS_API_KEY environment variable not set.")
+
+    async with CanvasClient(page_cache=PageCache()) as client:
+        courses = await get_my_courses(client, [])
+        if courses is None:
+            # Raised so the grade cache keeps serving the last good summaries
+            raise RuntimeError("Could not retrieve courses from Canvas")
+        results = await asyncio.gather(
+            *(analyze_course(client, course, targets) for course in courses)
+        )
+    GRADE_BOOK.retain(course.get("id") for course in courses)
+    return [summary for _, summary in results]
+
+
+async def fetch_upcoming_deadlines():
+    """Returns every upcoming unsubmitted assignment across active courses."""
+    if not API_TOKEN:
+        raise RuntimeError("CANVAS_API_KEY environment variable not set.")
+
+    async with CanvasClient(page_cache=PageCache()) as client:
+        courses = await get_my_courses(client, [])
+        if courses is None:
+            raise RuntimeError("Could not retrieve courses from Canvas")
+        courses = [c for c in courses if c.get("id")]
+        results = await asyncio.gather(
+            *(
+                get_assignments(client, c["id"], c.get("name"), [])
+                for c in courses
+            )
+        )
+    deadlines = []
+    for course, assignments in zip(courses, results):
+        if assignments is None:
+            # A partial list would cancel the reminders of this course
+            raise RuntimeError(f"Could not retrieve assignments for {course['id']}")
+        deadlines.extend(upcoming_deadlines(course, assignments))
+    return deadlines
+
+
+async def run_canvas_analysis_async():
+    """Runs the full analysis, fetching all courses concurrently, and returns the output as a single string."""
     output_lines = []  # Initialize list to store output lines
 
     # Check API Token (keep console print for immediate feedback)
@@ -331,40 +617,31 @@ def run_canvas_analysis():
         output_lines.append("Error: CANVAS_API_KEY environment variable not set.")
         return "\n".join(output_lines)  # Return early with error
 
-    user_info = get_user_info(output_lines)
-    courses = get_my_courses(output_lines)
+    async with CanvasClient(page_cache=PageCache()) as client:
+        user_lines, course_lines = [], []
+        user_info, courses = await asyncio.gather(
+            get_user_info(client, user_lines), get_my_courses(client, course_lines)
+        )
+        output_lines.extend(user_lines + course_lines)
 
-    if courses:
-        for course in courses:
-            COURSE_ID_TO_CHECK = course.get("id")
-            COURSE_NAME_TO_CHECK = course.get("name", "Unnamed Course")  # Default name
-            if COURSE_ID_TO_CHECK:
-                assignments = get_assignments(
-                    COURSE_ID_TO_CHECK, COURSE_NAME_TO_CHECK, output_lines
-                )
-                submissions = get_my_submissions(
-                    COURSE_ID_TO_CHECK, COURSE_NAME_TO_CHECK, output_lines
-                )
-                if assignments is not None and submissions is not None:
-                    calculate_needed_score(
-                        assignments, submissions, TARGET_GRADE_PERCENTAGE, output_lines
-                    )
-                else:
-                    output_lines.append(
-                        f"\nSkipping grade calculation due to errors fetching assignments or submissions for course {COURSE_NAME_TO_CHECK} (ID: {COURSE_ID_TO_CHECK})."
-                    )
-            else:
-                # This case should be less likely if get_my_courses worked, but good to handle
-                output_lines.append(
-                    f"\nSkipping course '{COURSE_NAME_TO_CHECK}' because it has no ID."
-                )
-    else:
-        output_lines.append("\nCannot proceed without course list.")
+        if courses:
+            # Wall time follows the slowest course rather than the sum of all of them
+            for course_output, _ in await asyncio.gather(
+                *(analyze_course(client, course) for course in courses)
+            ):
+                output_lines.extend(course_output)
+        else:
+            output_lines.append("\nCannot proceed without course list.")
 
     # Join all collected lines into a single string
     return "\n".join(output_lines)
 
 
+def run_canvas_analysis():
+    """Runs the full analysis and returns the output as a single string."""
+    return asyncio.run(run_canvas_analysis_async())
+
+
 if __name__ == "__main__":
     final_output_string = run_canvas_analysis()
     print(final_output_string)  # Print the final combined string
\ No newline at end of file
@@ -0,0 +1,334 @@
+import heapq
+import json
+
+
+class DropSet:
+    """
+    Keeps the k lowest-scoring graded items of an assignment group out of its
+    totals as items are added, changed and removed. As in Canvas, at least one
+    graded item always counts, so at most n - 1 of n items are dropped.
+
+    The dropped items are held directly (k is tiny); everything else sits in
+    a min-heap by score ratio with lazy deletion, so promoting the next lowest
+    item after a change is O(log n).
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.dropped_score = 0.0
+        self.dropped_points = 0.0
+        self._items = {}  # id -> (ratio, score, points, version)
+        self._dropped = set()
+        self._kept = []  # (ratio, version, id)
+        self._version = 0
+
+    def add(self, item_id, score, points):
+        self.remove(item_id)
+        self._version += 1
+        ratio = score / points
+        self._items[item_id] = (ratio, score, points, self._version)
+        self._keep(item_id)
+
+        if self._dropped:
+            highest = self._highest_dropped()
+            if ratio < self._items[highest][0]:
+                # The new item takes the highest dropped item's slot below
+                self._dropped.discard(highest)
+                self._keep(highest)
+        self._rebalance()
+
+    def remove(self, item_id):
+        if self._items.pop(item_id, None) is None:
+            return
+        self._dropped.discard(item_id)
+        self._rebalance()
+
+    def _keep(self, item_id):
+        ratio, _, _, version = self._items[item_id]
+        heapq.heappush(self._kept, (ratio, version, item_id))
+
+    def _highest_dropped(self):
+        return max(self._dropped, key=lambda i: self._items[i][0])
+
+    def _rebalance(self):
+        limit = max(0, min(self.k, len(self._items) - 1))
+        while len(self._dropped) > limit:
+            highest = self._highest_dropped()
+            self._dropped.discard(highest)
+            self._keep(highest)
+        # Promote the lowest kept items into free slots
+        while len(self._dropped) < limit and self._kept:
+            ratio, version, candidate = heapq.heappop(self._kept)
+            item = self._items.get(candidate)
+            if (
+                item is not None
+                and item[3] == version
+                and candidate not in self._dropped
+            ):
+                self._dropped.add(candidate)
+        self._update_sums()
+
+    def _update_sums(self):
+        self.dropped_score = sum(self._items[i][1] for i in self._dropped)
+        self.dropped_points = sum(self._items[i][2] for i in self._dropped)
+
+
+class GroupState:
+    """Running totals for one assignment group."""
+
+    def __init__(self, weight=0.0, drop_lowest=0, never_drop=()):
+        self.weight = weight
+        self.never_drop = set(never_drop)
+        self.graded_score = 0.0
+        self.graded_points = 0.0
+        self.remaining_points = 0.0
+        self.drops = DropSet(drop_lowest) if drop_lowest else None
+
+    @property
+    def earned(self):
+        return self.graded_score - (self.drops.dropped_score if self.drops else 0.0)
+
+    @property
+    def possible(self):
+        return self.graded_points - (self.drops.dropped_points if self.drops else 0.0)
+
+    @property
+    def total(self):
+        return self.possible + self.remaining_points
+
+
+class CourseGrade:
+    """
+    Incremental grade state for one course.
+
+    Assignments and submissions are applied one at a time, each update touching
+    only its own group's running totals. Supports weighted assignment groups,
+    drop-lowest and never-drop rules, and answers what average is needed on
+    the remaining work for several target percentages at once.
+    """
+
+    def __init__(self, groups=(), weighted=False):
+        self.weighted = weighted
+        self.groups = {}
+        for group in groups:
+            rules = group.get("rules") or {}
+            self.groups[group.get("id")] = GroupState(
+                weight=float(group.get("group_weight") or 0.0),
+                drop_lowest=int(rules.get("drop_lowest") or 0),
+                never_drop=rules.get("never_drop") or (),
+            )
+        self._assignments = {}  # id -> (group id, points possible)
+        self._graded = {}  # id -> score
+        self._pending = {}  # scores seen before their assignment
+
+    def _group(self, group_id):
+        if group_id not in self.groups:
+            self.groups[group_id] = GroupState()
+        return self.groups[group_id]
+
+    def set_assignment(self, assignment):
+        """Registers or updates a published assignment worth points."""
+        assignment_id = assignment.get("id")
+        points = assignment.get("points_possible")
+        score = self._graded.get(assignment_id, self._pending.pop(assignment_id, None))
+        self.set_score(assignment_id, None)
+        self._forget(assignment_id)
+
+        if not assignment.get("published") or not points or points <= 0:
+            return
+        if assignment.get("omit_from_final_grade"):
+            return
+
+        group_id = assignment.get("assignment_group_id")
+        self._assignments[assignment_id] = (group_id, float(points))
+        self._group(group_id).remaining_points += float(points)
+        if score is not None:
+            self.set_score(assignment_id, score)
+
+    def apply_submission(self, submission):
+        """Applies a new or changed submission; returns False if its score is unusable."""
+        assignment_id = submission.get("assignment_id")
+        score = submission.get("score")
+        graded = submission.get("workflow_state") == "graded" or submission.get(
+            "graded_at"
+        )
+        if score is None or not graded:
+            self.set_score(assignment_id, None)
+            return True
+        try:
+            self.set_score(assignment_id, float(score))
+        except (ValueError, TypeError):
+            self.set_score(assignment_id, None)
+            return False
+        return True
+
+    def set_score(self, assignment_id, score):
+        """Sets or clears the graded score of a registered assignment."""
+        if assignment_id not in self._assignments:
+            if score is None:
+                self._pending.pop(assignment_id, None)
+            else:
+                self._pending[assignment_id] = score
+            return
+        group_id, points = self._assignments[assignment_id]
+        group = self._group(group_id)
+
+        previous = self._graded.pop(assignment_id, None)
+        if previous is not None:
+            group.graded_score -= previous
+            group.graded_points -= points
+            group.remaining_points += points
+            if group.drops:
+                group.drops.remove(assignment_id)
+
+        if score is None:
+            return
+        self._graded[assignment_id] = score
+        group.graded_score += score
+        group.graded_points += points
+        group.remaining_points -= points
+        if group.drops and assignment_id not in group.never_drop:
+            group.drops.add(assignment_id, score, points)
+
+    def _forget(self, assignment_id):
+        if assignment_id not in self._assignments:
+            return
+        group_id, points = self._assignments.pop(assignment_id)
+        self._group(group_id).remaining_points -= points
+
+    def _active_groups(self):
+        return [g for g in self.groups.values() if g.total > 0]
+
+    @property
+    def earned(self):
+        return sum(g.earned for g in self.groups.values())
+
+    @property
+    def graded_possible(self):
+        return sum(g.possible for g in self.groups.values())
+
+    @property
+    def remaining_possible(self):
+        return sum(g.remaining_points for g in self.groups.values())
+
+    @property
+    def total_possible(self):
+        return sum(g.total for g in self.groups.values())
+
+    def current_percentage(self):
+        """Percentage on graded work only, or 0.0 if nothing is graded."""
+        if self.weighted:
+            graded = [g for g in self.groups.values() if g.possible > 0]
+            weight = sum(g.weight for g in graded)
+            if weight <= 0:
+                return 0.0
+            return (
+                100.0 * sum(g.weight * g.earned / g.possible for g in graded) / weight
+            )
+        possible = self.graded_possible
+        return 100.0 * self.earned / possible if possible > 0 else 0.0
+
+    def _projection(self):
+        """
+        The final grade as a fraction is linear in the average fraction x
+        scored on remaining work: final(x) = base + slope * x. Returns
+        (base, slope), or None when the course has nothing worth points.
+        """
+        if self.weighted:
+            groups = self._active_groups()
+            weight = sum(g.weight for g in groups)
+            if weight <= 0:
+                return None
+            base = sum(g.weight * g.earned / g.total for g in groups) / weight
+            slope = (
+                sum(g.weight * g.remaining_points / g.total for g in groups) / weight
+            )
+            return base, slope
+        total = self.total_possible
+        if total <= 0:
+            return None
+        return self.earned / total, self.remaining_possible / total
+
+    def secured_percentage(self):
+        """
+        Final percentage if every remaining item scores zero, or None when the
+        course has nothing worth points.
+        """
+        projection = self._projection()
+        return None if projection is None else 100.0 * projection[0]
+
+    def needed_for(self, targets):
+        """
+        Maps each target percentage to the average percentage needed on all
+        remaining work, or None when nothing remains to be graded.
+        """
+        projection = self._projection()
+        if projection is None or projection[1] <= 0:
+            return {target: None for target in targets}
+        base, slope = projection
+        return {
+            target: max(0.0, 100.0 * (target / 100.0 - base) / slope)
+            for target in targets
+        }
+
+
+class GradeBook:
+    """
+    CourseGrade state per course, kept between refreshes.
+
+    Each update compares the fetched assignments and submissions with the
+    ones applied last time and applies only what changed, so a refresh where
+    one grade moved touches one group's totals. A change to the assignment
+    groups or to weighting rebuilds the course from scratch.
+    """
+
+    def __init__(self):
+        # course id -> (groups key, CourseGrade, {id: assignment},
+        #               {assignment id: submission state})
+        self._courses = {}
+
+    def update(self, course_id, assignments, submissions, groups=(), weighted=False):
+        """
+        Brings the course's grade up to date; returns (grade, submissions
+        whose score could not be used)
+        """
+        key = (json.dumps(groups or [], sort_keys=True, default=str), weighted)
+        state = self._courses.get(course_id)
+        if state is None or state[0] != key:
+            state = (key, CourseGrade(groups or (), weighted=weighted), {}, {})
+            self._courses[course_id] = state
+        _, grade, seen_assignments, seen_submissions = state
+
+        current = {a.get("id"): a for a in assignments}
+        for assignment_id in seen_assignments.keys() - current.keys():
+            # Unregister it, and reapply its score if it ever comes back
+            grade.set_assignment({"id": assignment_id})
+            del seen_assignments[assignment_id]
+            seen_submissions.pop(assignment_id, None)
+        for assignment_id, assignment in current.items():
+            if seen_assignments.get(assignment_id) != assignment:
+                grade.set_assignment(assignment)
+                seen_assignments[assignment_id] = assignment
+
+        rejected = []
+        current = {s.get("assignment_id"): s for s in submissions}
+        for assignment_id in seen_submissions.keys() - current.keys():
+            grade.set_score(assignment_id, None)
+            del seen_submissions[assignment_id]
+        for assignment_id, submission in current.items():
+            submission_state = (
+                submission.get("score"),
+                submission.get("workflow_state"),
+                submission.get("graded_at"),
+            )
+            if seen_submissions.get(assignment_id) == submission_state:
+                continue
+            if not grade.apply_submission(submission):
+                rejected.append(submission)
+            seen_submissions[assignment_id] = submission_state
+        return grade, rejected
+
+    def retain(self, course_ids):
+        """Forgets every course not in course_ids."""
+        for course_id in self._courses.keys() - set(course_ids):
+            del self._courses[course_id]
@@ -0,0 +1,220 @@
+import asyncio
+import datetime
+import uuid
+from typing import Awaitable, Callable
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+
+class TranscriptQueue:
+    """
+    Durable MongoDB-backed queue of call transcripts waiting for extraction.
+
+    Jobs are keyed on call_id, so a webhook retry for a call that is already
+    queued or processed is ignored. Workers claim jobs with a lease that is
+    renewed while the job runs; a job whose worker died is picked up again once
+    its lease expires, and only the current lease holder can finish it. A job
+    that keeps failing or losing its worker is moved to the dead state after
+    max_attempts.
+    """
+
+    def __init__(
+        self,
+        collection,
+        handler: Callable[[dict], Awaitable[None]],
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        lease_sec: int = 300,
+        poll_sec: float = 5.0,
+    ):
+        self.collection = collection
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_sec = lease_sec
+        self.poll_sec = poll_sec
+        self.processed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.last_lag_sec = None
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    async def create_indexes(self):
+        await self.collection.create_index(
+            [("status", ASCENDING), ("available_at", ASCENDING)]
+        )
+
+    async def enqueue(
+        self, call_id: str, transcript: str, phone: str = None, kind: str = None
+    ) -> bool:
+        """
+        Store a transcript for processing, returning False if call_id is known.
+        kind is stored on the job for the handler to dispatch on.
+        """
+        now = datetime.datetime.now()
+        try:
+            await self.collection.insert_one(
+                {
+                    "_id": call_id,
+                    "kind": kind,
+                    "transcript": transcript,
+                    "phone": phone,
+                    "status": PENDING,
+                    "attempts": 0,
+                    "enqueued_at": now,
+                    "available_at": now,
+                }
+            )
+        except DuplicateKeyError:
+            return False
+
+        self._wakeup.set()
+        return True
+
+    def start(self):
+        for n in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker(n)))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def stats(self) -> dict:
+        depth, in_flight, dead = await asyncio.gather(
+            self.collection.count_documents({"status": PENDING}),
+            self.collection.count_documents({"status": PROCESSING}),
+            self.collection.count_documents({"status": DEAD}),
+        )
+        oldest = await self.collection.find_one(
+            {"status": PENDING}, {"enqueued_at": 1}, sort=[("available_at", ASCENDING)]
+        )
+        oldest_lag = (
+            (datetime.datetime.now() - oldest["enqueued_at"]).total_seconds()
+            if oldest
+            else 0.0
+        )
+        return {
+            "depth": depth,
+            "in_flight": in_flight,
+            "dead": dead,
+            "oldest_pending_sec": oldest_lag,
+            "last_lag_sec": self.last_lag_sec,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    async def _claim(self):
+        now = datetime.datetime.now()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": PENDING, "available_at": {"$lte": now}},
+                    # Reclaim jobs whose worker died mid-processing
+                    {"status": PROCESSING, "lease_until": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": PROCESSING,
+                    "started_at": now,
+                    "lease_id": uuid.uuid4().hex,
+                    "lease_until": now + datetime.timedelta(seconds=self.lease_sec),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker(self, n: int):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                print(f"Transcript worker {n} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_sec)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                if job["attempts"] > self.max_attempts:
+                    # Every earlier attempt lost its lease without finishing
+                    await self._fail(job, "Lease expired on every attempt")
+                else:
+                    await self._run(job)
+            except Exception as e:
+                print(f"Transcript worker {n} could not update call {job['_id']}: {e}")
+
+    async def _run(self, job: dict):
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+        try:
+            await self.handler(job)
+        except Exception as e:
+            self.failed += 1
+            print(f"Error processing transcript for call {job['_id']}: {e}")
+            await self._fail(job, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        now = datetime.datetime.now()
+        self.last_lag_sec = (now - job["enqueued_at"]).total_seconds()
+        if await self._finish(
+            job,
+            {
+                "$set": {"status": DONE, "finished_at": now},
+                "$unset": {"transcript": ""},
+            },
+        ):
+            self.processed += 1
+
+    async def _renew_lease(self, job: dict):
+        while True:
+            await asyncio.sleep(self.lease_sec / 3)
+            until = datetime.datetime.now() + datetime.timedelta(seconds=self.lease_sec)
+            try:
+                await self.collection.update_one(
+                    {"_id": job["_id"], "lease_id": job["lease_id"]},
+                    {"$set": {"lease_until": until}},
+                )
+            except Exception as e:
+                print(f"Could not renew the lease on call {job['_id']}: {e}")
+
+    async def _fail(self, job: dict, error: str):
+        now = datetime.datetime.now()
+        if job["attempts"] >= self.max_attempts:
+            update = {"status": DEAD, "error": error, "finished_at": now}
+        else:
+            # Back off exponentially before the next attempt
+            delay = datetime.timedelta(seconds=30 * 2 ** (job["attempts"] - 1))
+            update = {"status": PENDING, "error": error, "available_at": now + delay}
+        if await self._finish(job, {"$set": update}) and update["status"] == DEAD:
+            self.dead_lettered += 1
+
+    async def _finish(self, job: dict, update: dict) -> bool:
+        """
+        Apply update only if this worker still holds the job's lease
+        """
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "lease_id": job["lease_id"]}, update
+        )
+        if not result.matched_count:
+            print(f"Lease on call {job['_id']} was lost to another worker")
+            return False
+        return True
@@ -0,0 +1,292 @@
+import asyncio
+import datetime
+import hashlib
+from collections import defaultdict
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+BUCKET_MINUTES = 5
+# Attempts to swap in a report before giving up on a hot email
+REPORT_RETRIES = 5
+# Reports for one email are serialized in-process through one of these locks
+REPORT_LOCKS = 64
+
+
+class UsageAggregator:
+    """
+    Folds the extension's cumulative browser usage reports into pre-aggregated
+    per-host totals.
+
+    The extension re-sends each hostname's running total for the day, so every
+    report is turned into deltas against the previous one and added with $inc
+    to a 5-minute bucket document and a daily document for the client's date.
+    The last report per email is kept in MongoDB with a revision number and
+    replaced only if the revision is unchanged, so concurrent reports for one
+    email, even from other processes, each take their deltas against a
+    different predecessor and nothing is counted twice. Reports for one email
+    are serialized in-process and a copy is kept in memory to skip the read.
+    """
+
+    def __init__(self, db, bucket_minutes: int = BUCKET_MINUTES):
+        self.bucket_minutes = bucket_minutes
+        self.buckets = db.get_collection("usage_buckets")
+        self.daily = db.get_collection("usage_daily")
+        self.reports = db.get_collection("usage_reports")
+        self.clients = db.get_collection("usage_clients")
+        # email -> (revision, client date, {hostname: cumulative seconds})
+        self._last: dict[str, tuple] = {}
+        self._locks = [asyncio.Lock() for _ in range(REPORT_LOCKS)]
+        # client id -> last accepted sequence number
+        self._seq: dict[str, int] = {}
+
+    async def create_indexes(self):
+        await self.buckets.create_index(
+            [("email", ASCENDING), ("bucket", ASCENDING), ("hostname", ASCENDING)],
+            unique=True,
+        )
+        await self.daily.create_index(
+            [("email", ASCENDING), ("day", ASCENDING), ("hostname", ASCENDING)],
+            unique=True,
+        )
+
+    async def record_report(self, email: str, date: str, totals: dict[str, int]):
+        """
+        Record a report of cumulative seconds per hostname for the client's date
+        """
+        async with self._locks[hash(email) % REPORT_LOCKS]:
+            deltas = await self._swap_deltas(email, date, totals)
+        await self.record_deltas(email, deltas, date)
+
+    async def _swap_deltas(
+        self, email: str, date: str, totals: dict[str, int]
+    ) -> dict[str, int]:
+        """
+        Store totals as the email's last report and return the seconds added
+        since the report they replace
+        """
+        for _ in range(REPORT_RETRIES):
+            rev, last_date, last = await self._last_report(email)
+            if last_date != date:
+                last = {}
+
+            deltas = {}
+            for hostname, total in totals.items():
+                previous = last.get(hostname, 0)
+                # A smaller total means the extension reset its counters
+                delta = total - previous if total >= previous else total
+                if delta > 0:
+                    deltas[hostname] = delta
+
+            if await self._swap_report(email, rev, date, {**last, **totals}):
+                return deltas
+            # Another process stored a report for this email first; start from it
+            self._last.pop(email, None)
+        raise RuntimeError(f"Usage report for {email} kept conflicting")
+
+    async def record_batch(
+        self, client_id: str, seq: int, email: str, deltas: dict[str, int], day: str
+    ) -> bool:
+        """
+        Record a delta report unless its sequence number was already applied.
+
+        Applying is idempotent per (client_id, seq), so a report can be
+        re-sent after any failure: the first attempt pins the bucket the
+        report lands in, every $inc is guarded by the last seq of that client
+        applied to the document, and the sequence is claimed last. Workers
+        racing on the same report add it once between them, and only the one
+        that claims the sequence returns True.
+        """
+        async with self._locks[hash(client_id) % REPORT_LOCKS]:
+            bucket = await self._begin_batch(client_id, seq)
+            if bucket is None:
+                return False
+            await self.record_deltas(
+                email, deltas, day, now=bucket, applied=(_client_key(client_id), seq)
+            )
+            # False when another worker applied the same report first
+            return await self.claim_sequence(client_id, seq)
+
+    async def _begin_batch(self, client_id: str, seq: int):
+        """
+        Return the bucket time pinned for a report, pinning the current one on
+        its first attempt, or None if the report was already applied
+        """
+        if seq <= self._seq.get(client_id, -1):
+            return None
+        for _ in range(REPORT_RETRIES):
+            doc = await self.clients.find_one({"_id": client_id}) or {}
+            if doc.get("seq", -1) >= seq:
+                return None
+            pending = doc.get("pending") or {}
+            if pending.get("seq") == seq:
+                return pending["bucket"]
+            try:
+                # Matches only if no attempt has pinned this seq in the meantime
+                await self.clients.update_one(
+                    {"_id": client_id, "pending.seq": {"$ne": seq}},
+                    {
+                        "$set": {
+                            "pending": {"seq": seq, "bucket": datetime.datetime.now()}
+                        }
+                    },
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                continue
+        raise RuntimeError(f"Usage report {client_id}/{seq} kept conflicting")
+
+    async def claim_sequence(self, client_id: str, seq: int) -> bool:
+        """
+        Accept a delta report's sequence number only if it is newer than the
+        client's last one, so a replayed report is never counted twice
+        """
+        if seq <= self._seq.get(client_id, -1):
+            return False
+        # Matches only an older sequence; otherwise the upsert collides with
+        # the existing document
+        try:
+            await self.clients.update_one(
+                {"_id": client_id, "seq": {"$not": {"$gte": seq}}},
+                {"$set": {"seq": seq}, "$unset": {"pending": ""}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        self._seq[client_id] = seq
+        return True
+
+    async def record_deltas(
+        self, email: str, deltas: dict[str, int], day: str, now=None, applied=None
+    ):
+        """
+        Add seconds per hostname to the current bucket and to the client's
+        day, one batched write per collection. With applied=(client key, seq),
+        a document that already has that client's seq (or a later one) is
+        left alone.
+        """
+        if not deltas:
+            return
+
+        now = now or datetime.datetime.now()
+        bucket = now.replace(
+            minute=now.minute - now.minute % self.bucket_minutes,
+            second=0,
+            microsecond=0,
+        )
+
+        guard = {}
+        update = {}
+        if applied is not None:
+            field, seq = f"applied.{applied[0]}", applied[1]
+            guard = {field: {"$not": {"$gte": seq}}}
+            update = {"$set": {field: seq}}
+
+        bucket_ops = []
+        daily_ops = []
+        for hostname, seconds in deltas.items():
+            bucket_ops.append(
+                UpdateOne(
+                    {"email": email, "bucket": bucket, "hostname": hostname, **guard},
+                    {"$inc": {"active_sec": seconds}, **update},
+                    upsert=True,
+                )
+            )
+            daily_ops.append(
+                UpdateOne(
+                    {"email": email, "day": day, "hostname": hostname, **guard},
+                    {"$inc": {"active_sec": seconds}, **update},
+                    upsert=True,
+                )
+            )
+
+        await asyncio.gather(
+            _bulk_write_applied(self.buckets, bucket_ops),
+            _bulk_write_applied(self.daily, daily_ops),
+        )
+
+    async def rollup(
+        self, email: str, period: str, start: datetime.date, end: datetime.date
+    ) -> list[dict]:
+        """
+        Sum daily documents into per-day or per-week totals between start and end
+        """
+        docs = await self.daily.find(
+            {
+                "email": email,
+                "day": {"$gte": start.isoformat(), "$lte": end.isoformat()},
+            },
+            {"_id": 0, "day": 1, "hostname": 1, "active_sec": 1},
+        ).to_list()
+
+        periods = defaultdict(lambda: defaultdict(int))
+        for doc in docs:
+            day = datetime.date.fromisoformat(doc["day"])
+            if period == "weekly":
+                day -= datetime.timedelta(days=day.weekday())
+            periods[day.isoformat()][doc["hostname"]] += doc["active_sec"]
+
+        return [
+            {"period": key, "total_sec": sum(hosts.values()), "hosts": dict(hosts)}
+            for key, hosts in sorted(periods.items())
+        ]
+
+    async def _last_report(self, email: str) -> tuple:
+        if email not in self._last:
+            doc = await self.reports.find_one({"_id": email})
+            if doc:
+                # Reports written before revisions were added count as rev 0
+                self._last[email] = (
+                    doc.get("rev", 0),
+                    doc["date"],
+                    dict(doc["hosts"]),
+                )
+            else:
+                return None, None, {}
+        return self._last[email]
+
+    async def _swap_report(
+        self, email: str, rev, date: str, totals: dict[str, int]
+    ) -> bool:
+        """
+        Replace the stored report if it is still at rev (None: none stored yet)
+        """
+        doc = {
+            "rev": (rev or 0) + 1,
+            "date": date,
+            "hosts": [[h, s] for h, s in totals.items()],
+        }
+        if rev is None:
+            try:
+                await self.reports.insert_one({"_id": email, **doc})
+            except DuplicateKeyError:
+                return False
+        else:
+            # A rev of 0 matches reports stored without the field
+            result = await self.reports.replace_one(
+                {"_id": email, "rev": rev or None}, doc
+            )
+            if not result.matched_count:
+                return False
+        self._last[email] = (doc["rev"], date, totals)
+        return True
+
+
+def _client_key(client_id: str) -> str:
+    # Client ids are used in field names, which can't hold "." or "$"
+    return hashlib.sha256(client_id.encode()).hexdigest()[:16]
+
+
+async def _bulk_write_applied(collection, ops: list):
+    """
+    bulk_write upserts whose guard failed because the document already has
+    the update collide with its unique index; those count as applied
+    """
+    try:
+        await collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if e.details.get("writeConcernErrors") or any(
+            error.get("code") != 11000 for error in errors
+        ):
+            raise
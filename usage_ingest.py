@@ -0,0 +1,119 @@
+import datetime
+import json
+import re
+import zlib
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+try:
+    import msgpack
+except ImportError:  # msgpack bodies are optional
+    msgpack = None
+
+# Largest decompressed body accepted, so a small gzip body can't expand unbounded
+MAX_USAGE_BODY = 1 << 20
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class UsageIngestError(Exception):
+    pass
+
+
+def is_iso_date(value: str) -> bool:
+    """
+    True for a calendar date written as YYYY-MM-DD, the form daily usage is
+    keyed and range-queried on
+    """
+    if not ISO_DATE.fullmatch(value):
+        return False
+    try:
+        datetime.date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+class UsageBatch(BaseModel):
+    """
+    One v2 usage report: header fields once, then seconds added per hostname
+    since the client's previous report
+    """
+
+    client_id: str
+    seq: int
+    email: str
+    date: str
+    deltas: dict[str, int]
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        if not is_iso_date(value):
+            raise ValueError("date must be YYYY-MM-DD")
+        return value
+
+
+def decode_body(body: bytes, content_type: str, content_encoding: str) -> object:
+    if content_encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_USAGE_BODY)
+        except zlib.error as e:
+            raise UsageIngestError(f"Invalid gzip body: {e}")
+        if decompressor.unconsumed_tail:
+            raise UsageIngestError("Usage report too large")
+        if not decompressor.eof:
+            raise UsageIngestError("Truncated gzip body")
+        if decompressor.unused_data:
+            raise UsageIngestError("Trailing data after gzip body")
+    elif content_encoding not in ("", "identity"):
+        raise UsageIngestError(f"Unsupported encoding {content_encoding}")
+
+    if content_type.startswith("application/msgpack"):
+        if msgpack is None:
+            raise UsageIngestError("msgpack bodies are not supported")
+        try:
+            return msgpack.unpackb(body)
+        except Exception as e:
+            raise UsageIngestError(f"Invalid msgpack body: {e}")
+    try:
+        return json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise UsageIngestError(f"Invalid JSON body: {e}")
+
+
+def parse_batch(data: object) -> UsageBatch:
+    """
+    Validate a decoded report. Well-formed reports, the common case, are
+    checked with plain type tests and built with model_construct; anything
+    else goes through full Pydantic validation for its error message.
+    """
+    if (
+        type(data) is dict
+        and type(data.get("client_id")) is str
+        and type(data.get("seq")) is int
+        and type(data.get("email")) is str
+        and type(data.get("date")) is str
+        and is_iso_date(data["date"])
+        and type(data.get("deltas")) is dict
+        and all(
+            type(hostname) is str and type(seconds) is int and seconds >= 0
+            for hostname, seconds in data["deltas"].items()
+        )
+    ):
+        return UsageBatch.model_construct(
+            client_id=data["client_id"],
+            seq=data["seq"],
+            email=data["email"],
+            date=data["date"],
+            deltas=data["deltas"],
+        )
+
+    try:
+        batch = UsageBatch.model_validate(data)
+    except ValidationError as e:
+        raise UsageIngestError(str(e))
+    if any(seconds < 0 for seconds in batch.deltas.values()):
+        raise UsageIngestError("Usage deltas must not be negative")
+    return batch